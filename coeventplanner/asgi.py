@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coeventplanner.settings')
 
+# Async views such as the chat event stream (/api/events/<id>/messages/stream/)
+# hold their connection open and should be served through this application.
+# Set ASYNC_READ_VIEWS so that the read-heavy endpoints use their native async
+# views instead of holding a thread each.
 application = get_asgi_application()
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'coeventplannerapp.middleware.QueryMetricsMiddleware',
+    'coeventplannerapp.middleware.ReplicaPinningMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'coeventplannerapp.middleware.DisableCSRFOnTokenView',
     'django.middleware.security.SecurityMiddleware',
@@ -87,10 +89,62 @@ WSGI_APPLICATION = 'coeventplanner.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('COEVENTPLANNER_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Production database mode (COEVENTPLANNER_DB_MODE=production): WAL journal, a
+# busy timeout instead of immediate "database is locked" errors, write
+# transactions that take the lock up front, and tuned pragmas on every
+# connection. Setting COEVENTPLANNER_DB_REPLICA to a second SQLite file adds a
+# read replica, refreshed from the primary by `manage.py sync_replica`, see
+# coeventplannerapp/routers.py.
+SQLITE_PRODUCTION_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA mmap_size=134217728;'
+    ),
+}
+
+DATABASE_REPLICA_ALIAS = 'replica'
+
+if os.environ.get('COEVENTPLANNER_DB_MODE') == 'production':
+    DATABASES['default']['OPTIONS'] = SQLITE_PRODUCTION_OPTIONS
+
+    if os.environ.get('COEVENTPLANNER_DB_REPLICA'):
+        DATABASES[DATABASE_REPLICA_ALIAS] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['COEVENTPLANNER_DB_REPLICA'],
+            'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_ROUTERS = ['coeventplannerapp.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coeventplanner',
+    },
+    # Two keys per (user, event) pair, kept apart from the response cache so
+    # that culling either one never evicts the other's entries.
+    'membership': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coeventplanner-membership',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,11 +189,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'coeventplannerapp.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'coeventplannerapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -148,3 +206,46 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 AUTH_USER_MODEL = 'coeventplannerapp.User'
+
+# Cached (user, event) role lookups, see coeventplannerapp/membership.py
+MEMBERSHIP_CACHE_ALIAS = 'membership'
+MEMBERSHIP_CACHE_TTL = 60
+
+# Per-endpoint metrics exposed on /api/_metrics/, see coeventplannerapp/metrics.py
+METRICS_SAMPLE_SIZE = 1024
+# Maximum SQL queries per request, keyed by url_name or 'url_name:action'
+ENDPOINT_QUERY_BUDGETS = {}
+# Raise QueryBudgetExceeded instead of logging a warning (meant for tests)
+QUERY_BUDGET_RAISE = False
+
+# Thumbnail/WebP variants of uploaded images, see coeventplannerapp/images.py
+IMAGE_VARIANT_WORKERS = 2
+IMAGE_VARIANT_QUEUE_SIZE = 32
+IMAGE_VARIANTS_SYNC = False
+
+# Maximum tickets per POST /api/tickets/bulk/ and invitations per POST /api/teams/bulk/
+TICKET_BULK_MAX = 500
+TEAM_BULK_MAX = 1000
+
+# Task board columns (GET /api/events/<id>/tasks/board/) and cards per board move
+TASK_BOARD_PAGE_SIZE = 50
+TASK_BOARD_MAX_PAGE_SIZE = 200
+TASK_BOARD_MOVE_MAX = 1000
+
+# Cached anonymous event list/detail responses, see coeventplannerapp/responsecache.py
+EVENT_CACHE_ALIAS = 'default'
+EVENT_CACHE_TIMEOUT = 60
+
+# Users resolved by CachedJWTAuthentication, see coeventplannerapp/authentication.py
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 30
+
+# Messages older than this are moved to the archive by `manage.py archive_messages`, see coeventplannerapp/archive.py
+MESSAGE_ARCHIVE_AFTER_DAYS = 180
+MESSAGE_ARCHIVE_BATCH_SIZE = 1000
+
+# Rows fetched per database round trip by the streaming exports, see coeventplannerapp/exports.py
+EXPORT_CHUNK_SIZE = 2000
+
+# Route the read-heavy actions to the native async views in views.py; enable when serving through asgi.py
+ASYNC_READ_VIEWS = False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoeventplannerappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coeventplannerapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
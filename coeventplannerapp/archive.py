@@ -0,0 +1,63 @@
+"""
+Moves old messages from the hot Message table into ArchivedMessage.
+
+Messages are moved event by event, oldest first, in batches that each run in
+their own transaction, so the (event, created_at, id) index drives every
+batch and a failure leaves at most one batch to redo. Archived messages keep
+their ids and positions: MessageCursorPagination reads through to the
+archive once a page runs past the oldest hot message.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedMessage, Event, Message
+
+FIELDS = ['id', 'content', 'image', 'image_variants', 'sender_id', 'event_id', 'created_at']
+
+
+def _archive_after():
+    return datetime.timedelta(days=getattr(settings, 'MESSAGE_ARCHIVE_AFTER_DAYS', 180))
+
+
+def _batch_size():
+    return getattr(settings, 'MESSAGE_ARCHIVE_BATCH_SIZE', 1000)
+
+
+def cutoff(now=None):
+    """Messages created before this are archived."""
+    return (now or timezone.now()) - _archive_after()
+
+
+def archive_event(event_id, before, batch_size=None):
+    batch_size = batch_size or _batch_size()
+    moved = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Message.objects.select_for_update()
+                .filter(event_id=event_id, created_at__lt=before)
+                .order_by('created_at', 'id')
+                .values_list(*FIELDS)[:batch_size]
+            )
+            if not rows:
+                return moved
+
+            ArchivedMessage.objects.bulk_create([ArchivedMessage(**dict(zip(FIELDS, row))) for row in rows])
+            # The Message post_delete handlers bump the event version, but the
+            # history an archived message belongs to has not changed.
+            hot = Message.objects.filter(pk__in=[row[0] for row in rows])
+            hot._raw_delete(hot.db)
+
+        moved += len(rows)
+
+
+def archive_messages(before=None, event_ids=None, batch_size=None):
+    """Archive messages created before `before` (default: cutoff()). Returns the number moved."""
+    before = before or cutoff()
+    if event_ids is None:
+        event_ids = Event.objects.order_by('id').values_list('id', flat=True).iterator()
+    return sum(archive_event(event_id, before, batch_size) for event_id in event_ids)
@@ -0,0 +1,98 @@
+"""
+JWT authentication that resolves users from a bounded, process-wide LRU
+cache instead of loading the User row on every request.
+
+Only the user's concrete field values are cached; each request gets its own
+User instance built from them. Entries are dropped when the User is saved or
+deleted (see signals.py) and when users are changed with queryset.update()
+or bulk_update() (see UserQuerySet), which covers deactivation and password
+changes. Entries also expire after AUTH_USER_CACHE_TTL seconds so that other
+worker processes converge after a change.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def _max_size():
+    return getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000)
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+
+def _drop(user_id):
+    with _lock:
+        _cache.pop(str(user_id), None)
+
+
+def invalidate(user_id):
+    _drop(user_id)
+    # A request that read the old row before the writing transaction
+    # committed could have cached it again in the meantime.
+    transaction.on_commit(lambda: _drop(user_id))
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def _load_user(self, user_id):
+        key = str(user_id)
+        now = time.monotonic()
+
+        with _lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[2] > now:
+                _cache.move_to_end(key)
+                field_names, values = entry[0], entry[1]
+                return self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+        # From the primary, so that a stale replica never ends up in the cache.
+        user = self.user_model.objects.using(DEFAULT_DB_ALIAS).get(**{api_settings.USER_ID_FIELD: user_id})
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields]
+        values = tuple(getattr(user, name) for name in field_names)
+
+        with _lock:
+            _cache[key] = (field_names, values, now + _ttl())
+            _cache.move_to_end(key)
+            while len(_cache) > _max_size():
+                _cache.popitem(last=False)
+
+        return user
+
+    def get_user(self, validated_token):
+        # Same checks as JWTAuthentication.get_user, against the cached row.
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self._load_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,75 @@
+"""
+In-process pub/sub fan-out of new chat messages to server-sent-event streams.
+
+Publishers run in request threads, subscribers are asyncio queues owned by
+the ASGI event loop, so delivery goes through loop.call_soon_threadsafe.
+A subscriber that falls too far behind is closed; the client's EventSource
+reconnects with Last-Event-ID and catches up from the database.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class Subscription:
+    def __init__(self, event_id, loop, maxsize):
+        self.event_id = event_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def _deliver(self, item):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Wake up the reader so it can close the stream.
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    def push(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, item)
+        except RuntimeError:
+            # The loop was closed under us, the stream is gone.
+            pass
+
+
+class MessageBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, event_id):
+        maxsize = getattr(settings, 'MESSAGE_STREAM_QUEUE_SIZE', 100)
+        subscription = Subscription(event_id, asyncio.get_running_loop(), maxsize)
+
+        with self._lock:
+            self._subscribers[event_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.event_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.event_id]
+
+    def publish(self, event_id, message_id, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event_id, ()))
+
+        for subscription in subscribers:
+            subscription.push((message_id, data))
+
+    def subscriber_count(self, event_id):
+        with self._lock:
+            return len(self._subscribers.get(event_id, ()))
+
+
+broker = MessageBroker()
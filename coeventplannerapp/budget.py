@@ -0,0 +1,76 @@
+"""
+Maintains the per-event EventBudget rollup.
+
+BudgetItem and Ticket signals (see signals.py) apply deltas with F()
+expressions inside the writing transaction. Rows are created with their
+event; events that predate rollups got theirs from migration 0014, and a
+missing or drifted one is rebuilt from scratch on read or by the
+rebuild_budgets management command.
+"""
+from django.db.models import Count, F, Sum
+
+from .models import BudgetItem, Event, EventBudget, Ticket
+
+
+def _apply(event_id, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+
+    EventBudget.objects.filter(event_id=event_id).update(**updates)
+
+
+def budget_items_changed(event_id, total_delta, count_delta):
+    _apply(event_id, total=total_delta, item_count=count_delta)
+
+
+def tickets_changed(event_id, count_delta):
+    _apply(event_id, ticket_count=count_delta)
+
+
+def rebuild(event_ids=None):
+    """Recompute rollups from scratch for the given events, or for all of them."""
+    events = Event.objects.all()
+    items = BudgetItem.objects.all()
+    tickets = Ticket.objects.all()
+
+    if event_ids is not None:
+        events = events.filter(id__in=event_ids)
+        items = items.filter(event_id__in=event_ids)
+        tickets = tickets.filter(event_id__in=event_ids)
+
+    item_totals = {
+        row['event']: row
+        for row in items.values('event').annotate(total=Sum('amount'), item_count=Count('id'))
+    }
+    ticket_counts = dict(tickets.values('event').annotate(ticket_count=Count('id')).values_list('event', 'ticket_count'))
+
+    budgets = []
+    for event_id in events.values_list('id', flat=True):
+        item_row = item_totals.get(event_id, {})
+        budgets.append(EventBudget(
+            event_id=event_id,
+            total=item_row.get('total') or 0,
+            item_count=item_row.get('item_count', 0),
+            ticket_count=ticket_counts.get(event_id, 0),
+        ))
+
+    # An upsert, so two requests rebuilding the same missing rollup both
+    # succeed instead of one hitting the primary key.
+    EventBudget.objects.bulk_create(
+        budgets,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['event'],
+        update_fields=['total', 'item_count', 'ticket_count'],
+    )
+    return len(budgets)
+
+
+def get_summary(event_id):
+    try:
+        return EventBudget.objects.select_related('event').get(event_id=event_id)
+    except EventBudget.DoesNotExist:
+        if not rebuild([event_id]):
+            return None
+        return EventBudget.objects.select_related('event').get(event_id=event_id)
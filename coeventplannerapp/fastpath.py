@@ -0,0 +1,126 @@
+"""
+Read-only fast path for the hot list actions.
+
+A RowMapper is compiled once from the serializer class it stands in for.
+Rows are fetched with values_list() over the joined columns the serializer
+reads and shaped into dicts with the same keys, in the same order, as the
+serializer's output. Related objects come out as primary keys, files and
+image variants as absolute URLs, and every other field goes through the
+serializer field's own to_representation(). Serializer features the mapper
+cannot reproduce raise ImproperlyConfigured when it is compiled.
+"""
+import functools
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import FileField as ModelFileField
+from rest_framework import relations, serializers
+
+from .images import variants_storage
+from .serializers import ImageVariantsField
+from .sparse import model_field
+
+MAPPER_CACHE_SIZE = 256
+
+
+def _file_converter(storage):
+    def convert(name, build_absolute_uri):
+        if not name:
+            return None
+        url = storage.url(name)
+        return build_absolute_uri(url) if build_absolute_uri is not None else url
+    return convert
+
+
+def _variants_converter(storage):
+    def convert(names, build_absolute_uri):
+        if not names:
+            return None
+        urls = {}
+        for variant, variant_name in names.items():
+            url = storage.url(variant_name)
+            urls[variant] = build_absolute_uri(url) if build_absolute_uri is not None else url
+        return urls
+    return convert
+
+
+def _value_converter(field):
+    to_representation = field.to_representation
+
+    def convert(value, build_absolute_uri):
+        return to_representation(value)
+    return convert
+
+
+class RowMapper:
+    def __init__(self, serializer_class, fields=None, columns=()):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+
+        # Columns the caller reads from the rows itself, e.g. pagination cursors.
+        self.columns = list(columns)
+        self._fields = []
+        for field in serializer._readable_fields:
+            if fields is not None and field.field_name not in fields:
+                continue
+            if field.source == '*' or isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField, relations.ManyRelatedField)):
+                raise ImproperlyConfigured('%s.%s has no fast path.' % (serializer_class.__name__, field.field_name))
+
+            column = '__'.join(field.source_attrs)
+            if column not in self.columns:
+                self.columns.append(column)
+            index = self.columns.index(column)
+
+            field_model = model_field(model, field.source_attrs)
+            if isinstance(field, ImageVariantsField):
+                convert = _variants_converter(variants_storage(field_model))
+            elif isinstance(field, serializers.FileField):
+                if not isinstance(field_model, ModelFileField):
+                    raise ImproperlyConfigured('%s.%s has no fast path.' % (serializer_class.__name__, field.field_name))
+                convert = _file_converter(field_model.storage)
+            elif isinstance(field, relations.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise ImproperlyConfigured('%s.%s has no fast path.' % (serializer_class.__name__, field.field_name))
+                # values_list() already yields the related primary key.
+                convert = None
+            else:
+                convert = _value_converter(field)
+
+            self._fields.append((field.field_name, index, convert))
+
+    @property
+    def field_names(self):
+        """The keys of every item to_representation() returns, in order."""
+        return [name for name, index, convert in self._fields]
+
+    def fetch(self, queryset):
+        """
+        The queryset's rows as named tuples, so callers such as cursor
+        pagination can still read columns by attribute.
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, rows, request=None):
+        build_absolute_uri = request.build_absolute_uri if request is not None else None
+        fields = self._fields
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, convert in fields:
+                value = row[index]
+                if value is None or convert is None:
+                    item[name] = value
+                else:
+                    item[name] = convert(value, build_absolute_uri)
+            data.append(item)
+        return data
+
+
+@functools.lru_cache(maxsize=MAPPER_CACHE_SIZE)
+def mapper_for(serializer_class, fields=None, columns=()):
+    """
+    The mapper for `serializer_class`, restricted to `fields` (a frozenset,
+    see sparse.selected_fields) when given. Every subset of a serializer's
+    fields is a distinct key, so the cache is bounded.
+    """
+    return RowMapper(serializer_class, fields, columns)
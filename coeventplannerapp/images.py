@@ -0,0 +1,193 @@
+"""
+Thumbnail and WebP variants for uploaded images.
+
+Variants are written next to the original through the field's storage as
+<stem>.<variant>.<ext> and <stem>.<variant>.webp. storage.save() may pick
+another name when one is taken, so the names actually saved are recorded in
+the model's image_variants field, and serializers only link those. Rows
+whose variants have not been generated yet have none to link.
+
+Generation runs after commit on a bounded thread pool; when the pool is
+saturated the work runs in the saving thread instead of queueing without
+bound. Variants are deleted after commit when their image is replaced or
+their row is deleted (see signals.py).
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop). Cropped variants are exactly width x height,
+# the others fit inside the box and keep their aspect ratio.
+VARIANTS = {
+    'thumb': (128, 128, True),
+    'medium': (640, 640, False),
+}
+
+WEBP_QUALITY = 80
+
+# The model field holding an image's saved variant names, next to `image`.
+VARIANTS_FIELD = 'image_variants'
+
+# Sent with the row (as loaded before generation) once its new variant names
+# are stored. The update bypasses post_save, so caches listen to this instead.
+variants_saved = Signal()
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def variants_storage(variants_field):
+    """The storage the variants recorded in `variants_field` were saved to."""
+    return variants_field.model._meta.get_field('image').storage
+
+
+def variant_names(name):
+    """The names variants of `name` are saved under when they are free."""
+    stem, ext = os.path.splitext(name)
+    names = {}
+    for variant in VARIANTS:
+        names[variant] = '%s.%s%s' % (stem, variant, ext)
+        names[variant + '_webp'] = '%s.%s.webp' % (stem, variant)
+    return names
+
+
+def _render(image, width, height, crop, fmt):
+    if crop:
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((width, height), Image.LANCZOS)
+
+    if fmt in ('JPEG', 'WEBP') and resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA' if 'A' in resized.getbands() else 'RGB')
+    if fmt == 'JPEG' and resized.mode == 'RGBA':
+        resized = resized.convert('RGB')
+
+    output = BytesIO()
+    if fmt == 'WEBP':
+        resized.save(output, format=fmt, quality=WEBP_QUALITY, method=4)
+    else:
+        resized.save(output, format=fmt, optimize=True)
+    return output.getvalue()
+
+
+def generate_variants(storage, name, stored=None, force=False):
+    """
+    Save the variants of `name` missing from `stored`, the names recorded for
+    it so far, and return the names of every variant. With `force`, all of
+    them are rendered again.
+    """
+    stored = stored or {}
+    names = variant_names(name)
+
+    if not force and all(variant in stored and storage.exists(stored[variant]) for variant in names):
+        return dict(stored)
+
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+
+    fmt = image.format or 'PNG'
+    image = ImageOps.exif_transpose(image)
+
+    saved = {}
+    for variant, (width, height, crop) in VARIANTS.items():
+        for key, variant_format in [(variant, fmt), (variant + '_webp', 'WEBP')]:
+            previous = stored.get(key)
+            if previous and storage.exists(previous):
+                if not force:
+                    saved[key] = previous
+                    continue
+                storage.delete(previous)
+            saved[key] = storage.save(names[key], ContentFile(_render(image, width, height, crop, variant_format)))
+
+    return saved
+
+
+def store_variants(model, pk, name, force=False):
+    """
+    Generate the variants of the row's image `name` and record their names,
+    unless the row has been deleted or given another image in the meantime.
+    """
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or instance.image.name != name:
+        return None
+
+    storage = instance.image.storage
+    stored = getattr(instance, VARIANTS_FIELD)
+    saved = generate_variants(storage, name, stored, force)
+    if saved == stored:
+        return saved
+
+    if model._default_manager.filter(pk=pk, image=name).update(**{VARIANTS_FIELD: saved}):
+        variants_saved.send(sender=model, instance=instance)
+    else:
+        # The image changed while these were rendered, nothing will link them.
+        _delete(storage, set(saved.values()) - set(stored.values()))
+    return saved
+
+
+def _delete(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Could not delete image variant %s', name)
+
+
+def delete_variants(storage, variants):
+    """Delete the files of a variants dict once the current transaction commits."""
+    names = [name for name in (variants or {}).values() if name]
+    if names:
+        transaction.on_commit(lambda: _delete(storage, names))
+
+
+def _run(model, pk, name):
+    try:
+        store_variants(model, pk, name)
+    except Exception:
+        logger.exception('Could not generate image variants for %s', name)
+
+
+def _pool():
+    global _executor, _slots
+
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+            _slots = threading.BoundedSemaphore(workers + getattr(settings, 'IMAGE_VARIANT_QUEUE_SIZE', 32))
+    return _executor, _slots
+
+
+def _submit(model, pk, name):
+    if getattr(settings, 'IMAGE_VARIANTS_SYNC', False):
+        _run(model, pk, name)
+        return
+
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        _run(model, pk, name)
+        return
+
+    future = executor.submit(_run, model, pk, name)
+    future.add_done_callback(lambda _: slots.release())
+
+
+def schedule_variants(instance):
+    if not instance.image:
+        return
+
+    model, pk, name = type(instance), instance.pk, instance.image.name
+    transaction.on_commit(lambda: _submit(model, pk, name))
@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from coeventplannerapp import archive
+
+
+class Command(BaseCommand):
+    help = 'Move messages older than MESSAGE_ARCHIVE_AFTER_DAYS from the Message table into the message archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Only archive these events.')
+        parser.add_argument('--older-than-days', type=int, help='Archive messages older than this instead.')
+        parser.add_argument('--batch-size', type=int, help='Messages moved per transaction (default MESSAGE_ARCHIVE_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['older_than_days'] is not None:
+            before = timezone.now() - datetime.timedelta(days=options['older_than_days'])
+
+        count = archive.archive_messages(before, options['event_ids'] or None, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Archived %d message(s).' % count))
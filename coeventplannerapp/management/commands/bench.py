@@ -0,0 +1,438 @@
+import contextlib
+import datetime
+import importlib
+import itertools
+import json
+import random
+import sys
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from coeventplannerapp import budget, membership, views
+from coeventplannerapp.metrics import registry, quantile
+from coeventplannerapp.models import User, Event, Task, Team, BudgetItem, Ticket, Message, STATUS_CHOICES
+
+BATCH_SIZE = 1000
+
+# Routes run() leaves out, by endpoint_key().
+UNBENCHMARKED = {
+    # Server-sent events, the response never ends.
+    (views.event_message_stream, 'get'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset in a throwaway database and report per-endpoint latency and query counts as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=100)
+        parser.add_argument('--team-alpha', type=float, default=1.2, help='Pareto shape of team sizes; lower means heavier tail.')
+        parser.add_argument('--max-team-size', type=int, default=500)
+        parser.add_argument('--tasks-per-member', type=float, default=0.5)
+        parser.add_argument('--budget-items-per-event', type=int, default=20)
+        parser.add_argument('--tickets-per-member', type=float, default=1.0)
+        parser.add_argument('--messages-per-member', type=float, default=5.0)
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--keep-database', action='store_true', help='Run against the configured database, which must be empty, instead of a throwaway test database.')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        old_name = None
+
+        if options['keep_database']:
+            require_empty_database()
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        setup_test_environment()
+
+        try:
+            # Keep stray prints from views out of the JSON report.
+            with contextlib.redirect_stdout(sys.stderr):
+                dataset = seed(options)
+                endpoints, unbenchmarked = run(dataset, options['iterations'])
+            if unbenchmarked:
+                self.stderr.write('Routes without a benchmark target: %s' % ', '.join(unbenchmarked))
+
+            report = {
+                'options': {key: options[key] for key in [
+                    'users', 'events', 'team_alpha', 'max_team_size', 'tasks_per_member', 'budget_items_per_event',
+                    'tickets_per_member', 'messages_per_member', 'iterations', 'seed',
+                ]},
+                'dataset': dataset['counts'],
+                'endpoints': endpoints,
+                'unbenchmarked': unbenchmarked,
+            }
+        finally:
+            teardown_test_environment()
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            sys.stdout.write(output + '\n')
+
+
+def require_empty_database():
+    # seed() uses fixed usernames, so it cannot run twice on one database.
+    if User.objects.exists() or Event.objects.exists():
+        raise CommandError('--keep-database needs an empty database; run without it to use a throwaway one.')
+
+
+def team_size(alpha, max_size):
+    return max(1, min(max_size, int(random.paretovariate(alpha))))
+
+
+def seed(options):
+    password = make_password('bench-password')
+    users = User.objects.bulk_create(
+        [User(username='bench%d' % i, email='bench%d@example.com' % i, password=password, job_title='Planner')
+         for i in range(options['users'])],
+        batch_size=BATCH_SIZE,
+    )
+
+    now = timezone.now()
+    events = Event.objects.bulk_create(
+        [Event(
+            title='Event %d' % i,
+            description='Synthetic benchmark event %d' % i,
+            price=Decimal(random.randint(0, 20000)) / 100,
+            location='City %d' % random.randint(0, 50),
+            date=now + datetime.timedelta(days=random.randint(-30, 365)),
+        ) for i in range(options['events'])],
+        batch_size=BATCH_SIZE,
+    )
+
+    teams, tasks, budget_items, tickets, messages = [], [], [], [], []
+    statuses = [value for value, _ in STATUS_CHOICES]
+    max_team_size = min(options['max_team_size'], len(users))
+    members_by_event = {}
+
+    for event in events:
+        members = random.sample(users, team_size(options['team_alpha'], max_team_size))
+        members_by_event[event.id] = members
+
+        for index, user in enumerate(members):
+            is_organizer = index == 0
+            teams.append(Team(
+                user=user,
+                event=event,
+                role='organizer' if is_organizer else 'participant',
+                invitation_status=is_organizer or random.random() < 0.8,
+            ))
+
+        for i in range(round(len(members) * options['tasks_per_member'])):
+            tasks.append(Task(
+                title='Task %d' % i,
+                description='Synthetic task',
+                status=random.choice(statuses),
+                event=event,
+                user=random.choice(members),
+            ))
+
+        for i in range(options['budget_items_per_event']):
+            budget_items.append(BudgetItem(
+                title='Item %d' % i,
+                description='Synthetic budget item',
+                amount=Decimal(random.randint(100, 500000)) / 100,
+                event=event,
+            ))
+
+        for i in range(round(len(members) * options['tickets_per_member'])):
+            tickets.append(Ticket(code='%d-%d' % (event.id, i), user=random.choice(members), event=event))
+
+        for i in range(round(len(members) * options['messages_per_member'])):
+            messages.append(Message(content='Message %d' % i, sender=random.choice(members), event=event))
+
+    for model, rows in [(Team, teams), (Task, tasks), (BudgetItem, budget_items), (Ticket, tickets), (Message, messages)]:
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+    # bulk_create bypasses the Team, BudgetItem and Ticket signals.
+    membership.clear()
+    budget.rebuild()
+
+    largest_event = max(events, key=lambda event: len(members_by_event[event.id]))
+    members = members_by_event[largest_event.id]
+
+    return {
+        'counts': {
+            'users': len(users),
+            'events': len(events),
+            'teams': len(teams),
+            'tasks': len(tasks),
+            'budget_items': len(budget_items),
+            'tickets': len(tickets),
+            'messages': len(messages),
+            'largest_team': len(members),
+        },
+        'event': largest_event,
+        'organizer': members[0],
+        'participant': members[-1],
+        'password': password,
+    }
+
+
+def targets(dataset):
+    """
+    Every route and method in coeventplannerapp.urls, as (label, method,
+    prepare). prepare() returns the (path, user, data) of one request and
+    creates whatever that request uses up, so deletes and creates succeed on
+    every iteration. Reads come first, then writes, then deletes.
+    """
+    event = dataset['event']
+    organizer = dataset['organizer']
+    participant = dataset['participant']
+    serial = itertools.count()
+    statuses = itertools.cycle(value for value, _ in STATUS_CHOICES)
+
+    def fixed(path, user=None, data=None):
+        return lambda: (path, user, data)
+
+    def new_user():
+        n = next(serial)
+        return User.objects.create(username='benchextra%d' % n, email='benchextra%d@example.com' % n, password=dataset['password'])
+
+    def new_event():
+        created = Event.objects.create(title='bench', description='bench', price=event.price, location=event.location, date=event.date)
+        Team.objects.create(user=organizer, event=created, role='organizer', invitation_status=True)
+        return created
+
+    def new_task():
+        return Task.objects.create(title='bench', description='bench', event=event, user=participant)
+
+    def new_budget_item():
+        return BudgetItem.objects.create(title='bench', description='bench', amount=Decimal('1.00'), event=event)
+
+    def new_ticket():
+        return Ticket.objects.create(code='bench-%d' % next(serial), user=participant, event=event)
+
+    def new_message():
+        return Message.objects.create(content='bench', sender=organizer, event=event)
+
+    task = new_task()
+    budget_item = new_budget_item()
+    ticket = new_ticket()
+    message = new_message()
+    team = Team.objects.create(user=new_user(), event=event, role='participant', invitation_status=False)
+    event_data = {
+        'title': event.title, 'description': event.description, 'price': str(event.price),
+        'location': event.location, 'date': event.date.isoformat(),
+    }
+
+    def self_service(method):
+        # The user routes only let users read and change their own account.
+        def prepare():
+            user = new_user()
+            data = {'username': user.username, 'email': user.email, 'password': 'bench-password', 'job_title': 'Planner'}
+            return '/api/users/%d/' % user.id, user, data if method != 'delete' else None
+        return prepare
+
+    event_path = '/api/events/%d/' % event.id
+    return [
+        ('index', 'get', fixed('/')),
+        ('api-root', 'get', fixed('/api/', participant)),
+        ('csrf', 'get', fixed('/api/csrf/')),
+        ('metrics', 'get', fixed('/api/_metrics/', participant)),
+        ('user-list', 'get', fixed('/api/users/')),
+        ('user-retrieve', 'get', fixed('/api/users/%d/' % participant.id, participant)),
+        ('user-detail-by-username', 'get', fixed('/api/users/username/%s/' % participant.username, participant)),
+        ('event-list', 'get', fixed('/api/events/')),
+        ('event-retrieve', 'get', fixed(event_path)),
+        ('organizer-events', 'get', fixed('/api/me/events/', participant)),
+        ('dashboard', 'get', fixed('/api/me/dashboard/', participant)),
+        ('pending-teams', 'get', fixed('/api/me/teams/pending/', participant)),
+        ('unread-messages', 'get', fixed('/api/me/messages/unread/', participant)),
+        ('event-tasks', 'get', fixed(event_path + 'tasks/', participant)),
+        ('event-tasks-board', 'get', fixed(event_path + 'tasks/board/', participant)),
+        ('event-tasks-export', 'get', fixed(event_path + 'tasks/export/', organizer)),
+        ('event-teams', 'get', fixed(event_path + 'teams/', participant)),
+        ('event-teams-export', 'get', fixed(event_path + 'teams/export/', organizer)),
+        ('event-budgetitems', 'get', fixed(event_path + 'budgetitems/', participant)),
+        ('event-budgetitems-export', 'get', fixed(event_path + 'budgetitems/export/', organizer)),
+        ('event-budget-summary', 'get', fixed(event_path + 'budget/summary/', participant)),
+        ('event-tickets', 'get', fixed(event_path + 'tickets/', participant)),
+        ('event-tickets-export', 'get', fixed(event_path + 'tickets/export/', organizer)),
+        ('event-messages', 'get', fixed(event_path + 'messages/', participant)),
+        ('event-messages-search', 'get', fixed(event_path + 'messages/search/?q=message', participant)),
+        ('user-tickets', 'get', fixed('/api/users/%d/tickets/' % participant.id, participant)),
+        ('task-list', 'get', fixed('/api/tasks/', participant)),
+        ('team-list', 'get', fixed('/api/teams/', participant)),
+        ('budgetitem-list', 'get', fixed('/api/budgetitems/', participant)),
+        ('ticket-list', 'get', fixed('/api/tickets/', participant)),
+        ('message-list', 'get', fixed('/api/messages/', participant)),
+        ('task-retrieve', 'get', fixed('/api/tasks/%d/' % task.id, participant)),
+        ('team-retrieve', 'get', fixed('/api/teams/%d/' % team.id, participant)),
+        ('budgetitem-retrieve', 'get', fixed('/api/budgetitems/%d/' % budget_item.id, participant)),
+        ('ticket-retrieve', 'get', fixed('/api/tickets/%d/' % ticket.id, participant)),
+        ('message-retrieve', 'get', fixed('/api/messages/%d/' % message.id, participant)),
+
+        ('token-obtain', 'post', fixed('/api/token/', None, {'username': participant.username, 'password': 'bench-password'})),
+        ('token-refresh', 'post', lambda: ('/api/token/refresh/', None, {'refresh': str(RefreshToken.for_user(participant))})),
+        ('user-create', 'post', lambda: ('/api/users/', None, {
+            'username': 'benchnew%d' % next(serial), 'email': 'benchnew@example.com', 'password': 'bench-password',
+        })),
+        ('user-update', 'put', self_service('put')),
+        ('user-partial-update', 'patch', self_service('patch')),
+        ('event-create', 'post', fixed('/api/events/', organizer, event_data)),
+        ('event-update', 'put', fixed(event_path, organizer, event_data)),
+        ('event-partial-update', 'patch', fixed(event_path, organizer, {'title': event.title})),
+        ('task-create', 'post', fixed('/api/tasks/', organizer, {
+            'title': 'bench', 'description': 'bench', 'status': 'not_started', 'event': event.id, 'user': participant.id,
+        })),
+        ('task-update', 'put', fixed('/api/tasks/%d/' % task.id, organizer, {
+            'title': 'bench', 'description': 'bench', 'status': 'not_started', 'event': event.id, 'user': participant.id,
+        })),
+        ('task-partial-update', 'patch', fixed('/api/tasks/%d/' % task.id, organizer, {'title': 'bench'})),
+        ('task-board-move', 'post', lambda: (event_path + 'tasks/board/move/', organizer, {
+            'moves': [{'id': task.id, 'status': next(statuses)}],
+        })),
+        ('team-create', 'post', lambda: ('/api/teams/', organizer, {
+            'event': event.id, 'username': new_user().username, 'role': 'participant', 'invitation_status': False,
+        })),
+        ('team-bulk-invite', 'post', lambda: ('/api/teams/bulk/', organizer, {
+            'event': event.id, 'usernames': [new_user().username for _ in range(10)],
+        })),
+        ('team-update', 'put', fixed('/api/teams/%d/' % team.id, organizer, {'role': 'participant'})),
+        ('team-partial-update', 'patch', fixed('/api/teams/%d/' % team.id, organizer, {'role': 'participant'})),
+        ('budgetitem-create', 'post', fixed('/api/budgetitems/', organizer, {
+            'title': 'bench', 'description': 'bench', 'amount': '1.00', 'event': event.id,
+        })),
+        ('budgetitem-update', 'put', fixed('/api/budgetitems/%d/' % budget_item.id, organizer, {
+            'title': 'bench', 'description': 'bench', 'amount': '1.00', 'event': event.id,
+        })),
+        ('budgetitem-partial-update', 'patch', fixed('/api/budgetitems/%d/' % budget_item.id, organizer, {'amount': '1.00'})),
+        ('ticket-create', 'post', lambda: ('/api/tickets/', participant, {
+            'event': event.id, 'user': participant.id, 'code': 'bench-%d' % next(serial),
+        })),
+        ('ticket-bulk-issue', 'post', fixed('/api/tickets/bulk/', organizer, {'event': event.id, 'count': 10})),
+        ('ticket-update', 'put', fixed('/api/tickets/%d/' % ticket.id, participant, {})),
+        ('ticket-partial-update', 'patch', fixed('/api/tickets/%d/' % ticket.id, participant, {})),
+        ('message-create', 'post', fixed('/api/messages/', participant, {'event': event.id, 'sender': participant.id, 'content': 'bench'})),
+        ('message-update', 'put', fixed('/api/messages/%d/' % message.id, organizer, {'event': event.id, 'sender': organizer.id, 'content': 'bench'})),
+        ('message-partial-update', 'patch', fixed('/api/messages/%d/' % message.id, organizer, {'content': 'bench'})),
+        ('event-messages-read', 'post', fixed(event_path + 'messages/read/', participant, {})),
+
+        ('user-destroy', 'delete', self_service('delete')),
+        ('event-destroy', 'delete', lambda: ('/api/events/%d/' % new_event().id, organizer, None)),
+        ('task-destroy', 'delete', lambda: ('/api/tasks/%d/' % new_task().id, organizer, None)),
+        ('team-destroy', 'delete', lambda: ('/api/teams/%d/' % Team.objects.create(
+            user=new_user(), event=event, role='participant', invitation_status=False,
+        ).id, organizer, None)),
+        ('budgetitem-destroy', 'delete', lambda: ('/api/budgetitems/%d/' % new_budget_item().id, organizer, None)),
+        ('ticket-destroy', 'delete', lambda: ('/api/tickets/%d/' % new_ticket().id, participant, None)),
+        ('message-destroy', 'delete', lambda: ('/api/messages/%d/' % new_message().id, organizer, None)),
+    ]
+
+
+def endpoint_key(callback, method):
+    # The router and the explicit paths in urls.py route to the same
+    # viewset action through different callbacks.
+    actions = getattr(callback, 'actions', None)
+    if actions:
+        return callback.cls, actions.get(method)
+    return getattr(callback, 'view_class', callback), method
+
+
+def _methods(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions:
+        # Viewsets map HEAD to the GET action.
+        return [method for method in actions if method != 'head']
+    view_class = getattr(callback, 'view_class', None)
+    if view_class is not None:
+        return [method for method in ('get', 'post', 'put', 'patch', 'delete') if hasattr(view_class, method)]
+    return ['get']
+
+
+def _patterns(patterns):
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from _patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def endpoints():
+    """Every (view, method) routed by coeventplannerapp.urls, mapped to 'METHOD url-name'."""
+    found = {}
+    for pattern in _patterns(importlib.import_module('coeventplannerapp.urls').urlpatterns):
+        for method in _methods(pattern.callback):
+            # The /api/events/<id>/... paths come after the router's, so their names win.
+            found[endpoint_key(pattern.callback, method)] = '%s %s' % (method.upper(), pattern.name)
+    return found
+
+
+def run(dataset, iterations):
+    """
+    Request every target `iterations` times. Returns the per-endpoint results
+    and the routes in endpoints() that no target reached.
+    """
+    client = Client()
+    tokens = {}
+    results = {}
+    reached = set()
+
+    for label, method, prepare in targets(dataset):
+        registry.reset()
+        status_codes = {}
+        request = getattr(client, method)
+
+        for _ in range(iterations):
+            path, user, data = prepare()
+            reached.add(endpoint_key(resolve(urlsplit(path).path).func, method))
+
+            headers = {}
+            if user is not None:
+                if user.id not in tokens:
+                    tokens[user.id] = str(AccessToken.for_user(user))
+                headers['HTTP_AUTHORIZATION'] = 'Bearer %s' % tokens[user.id]
+
+            if data is None:
+                response = request(path, **headers)
+            else:
+                response = request(path, data=json.dumps(data), content_type='application/json', **headers)
+            status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+        snapshot = registry.snapshot()
+        if not snapshot:
+            continue
+        (url_name, action), stats = next(iter(snapshot.items()))
+        results[label] = {
+            'method': method.upper(),
+            'path': path,
+            'url_name': url_name,
+            'action': action,
+            'requests': stats['count'],
+            'status_codes': {str(code): count for code, count in sorted(status_codes.items())},
+            'queries': summarize(stats['query_samples']),
+            'latency_ms': summarize([sample * 1000 for sample in stats['latency_samples']]),
+            'sql_ms': summarize([sample * 1000 for sample in stats['sql_samples']]),
+        }
+
+    registry.reset()
+    missing = sorted(name for key, name in endpoints().items() if key not in reached and key not in UNBENCHMARKED)
+    return results, missing
+
+
+def summarize(samples):
+    return {
+        'mean': round(sum(samples) / len(samples), 3) if samples else 0,
+        'p50': round(quantile(samples, 0.5), 3),
+        'p95': round(quantile(samples, 0.95), 3),
+        'p99': round(quantile(samples, 0.99), 3),
+        'max': round(max(samples), 3) if samples else 0,
+    }
@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import importlib
+import json
+import random
+import sys
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .bench import Command as BenchCommand, require_empty_database, seed, summarize
+
+
+class Command(BenchCommand):
+    help = (
+        'Seed a synthetic dataset in a throwaway database and compare the throughput of the read-heavy '
+        'endpoints at high concurrency, served through the ASGI handler by the sync viewset actions and '
+        'by the native async views (ASYNC_READ_VIEWS). Reports JSON.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight per endpoint.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode.')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        old_name = None
+
+        if options['keep_database']:
+            require_empty_database()
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        setup_test_environment()
+
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                dataset = seed(options)
+                modes = {}
+                for mode, async_views in [('sync', False), ('async', True)]:
+                    with override_settings(ASYNC_READ_VIEWS=async_views):
+                        reload_urls()
+                        modes[mode] = asyncio.run(run(dataset, options['requests'], options['concurrency']))
+                reload_urls()
+
+            report = {
+                'options': {key: options[key] for key in [
+                    'users', 'events', 'team_alpha', 'max_team_size', 'tasks_per_member', 'budget_items_per_event',
+                    'tickets_per_member', 'messages_per_member', 'requests', 'concurrency', 'seed',
+                ]},
+                'dataset': dataset['counts'],
+                'modes': modes,
+                'speedup': {
+                    label: round(modes['async'][label]['throughput_rps'] / modes['sync'][label]['throughput_rps'], 3)
+                    for label in modes['sync']
+                    if modes['sync'][label]['throughput_rps']
+                },
+            }
+        finally:
+            teardown_test_environment()
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            sys.stdout.write(output + '\n')
+
+
+def reload_urls():
+    # The read routes are chosen from ASYNC_READ_VIEWS when urls.py is imported.
+    importlib.reload(importlib.import_module('coeventplannerapp.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+def targets(dataset):
+    event = dataset['event']
+    participant = dataset['participant']
+
+    # (label, path, user)
+    return [
+        ('event-retrieve', '/api/events/%d/' % event.id, None),
+        ('organizer-events', '/api/me/events/', participant),
+        ('event-tasks', '/api/events/%d/tasks/' % event.id, participant),
+        ('event-teams', '/api/events/%d/teams/' % event.id, participant),
+        ('event-messages', '/api/events/%d/messages/' % event.id, participant),
+    ]
+
+
+async def run(dataset, total, concurrency):
+    client = AsyncClient()
+    results = {}
+
+    for label, path, user in targets(dataset):
+        headers = {'Accept': 'application/json'}
+        if user is not None:
+            headers['Authorization'] = 'Bearer %s' % AccessToken.for_user(user)
+
+        latencies = []
+        status_codes = {}
+        remaining = [total]
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(min(concurrency, total))])
+        elapsed = time.perf_counter() - started
+
+        results[label] = {
+            'path': path,
+            'requests': len(latencies),
+            'status_codes': {str(code): count for code, count in sorted(status_codes.items())},
+            'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'latency_ms': summarize(latencies),
+        }
+
+    return results
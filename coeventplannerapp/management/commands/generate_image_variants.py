@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from coeventplannerapp import images
+from coeventplannerapp.models import User, Event, Message
+
+
+class Command(BaseCommand):
+    help = 'Generate and record missing thumbnail and WebP variants for uploaded user, event and message images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist.')
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+
+        for model in [User, Event, Message]:
+            queryset = model.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image')
+            for instance in queryset.iterator(chunk_size=500):
+                try:
+                    images.store_variants(model, instance.pk, instance.image.name, force=options['force'])
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write('%s %s: %s' % (model.__name__, instance.image.name, e))
+
+        self.stdout.write(self.style.SUCCESS('Processed %d image(s), %d failed.' % (generated, failed)))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from coeventplannerapp import budget
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-event budget rollups from the BudgetItem and Ticket rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Only rebuild these events.')
+
+    def handle(self, *args, **options):
+        count = budget.rebuild(options['event_ids'] or None)
+        self.stdout.write(self.style.SUCCESS('Rebuilt %d event budget(s).' % count))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into the DATABASE_REPLICA_ALIAS database with the online backup API. '
+        'Readers of the replica keep seeing the previous snapshot until the copy commits.'
+    )
+
+    def handle(self, *args, **options):
+        alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+        if alias not in connections.settings:
+            raise CommandError('No %r database is configured.' % alias)
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections.settings[alias]
+        if primary.vendor != 'sqlite' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica copies SQLite databases only.')
+
+        primary.ensure_connection()
+        target = sqlite3.connect(str(replica['NAME']))
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+        self.stdout.write(self.style.SUCCESS('Copied %s to %s.' % (primary.settings_dict['NAME'], replica['NAME'])))
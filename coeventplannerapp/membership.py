@@ -0,0 +1,133 @@
+"""
+Resolves a user's role on an event: None, 'participant' or 'organizer'.
+
+Lookups are memoized on the request and cached in Django's cache framework
+(MEMBERSHIP_CACHE_ALIAS) for MEMBERSHIP_CACHE_TTL seconds. Each (user, event)
+pair has a version token that is part of the cache key. The Team signals (see
+signals.py) replace the token when the transaction writes and again once it
+commits. A request that read the old role in between stores it under a token
+that is no longer used. As with responsecache.py, use a shared backend when
+running several workers so that they all see the new token.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Team
+
+ORGANIZER = 'organizer'
+PARTICIPANT = 'participant'
+# Cached for non-members, since the cache cannot tell a stored None from a miss.
+NO_ROLE = ''
+
+# Replaced by clear(), which orphans every cached role at once.
+CLEAR_KEY = 'membership:gen'
+
+_lock = threading.Lock()
+# Bumped on every invalidation so that request-level memos can tell they are stale.
+_generation = 0
+
+
+def _cache():
+    return caches[getattr(settings, 'MEMBERSHIP_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'MEMBERSHIP_CACHE_TTL', 60)
+
+
+def _version_key(user_id, event_id):
+    return 'membership:ver:%s:%s' % (user_id, event_id)
+
+
+def _tokens(cache, keys):
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            # Never fall back to a fixed default: an evicted token must not
+            # revive entries written under an older one.
+            cache.add(key, uuid.uuid4().hex, None)
+            tokens[key] = cache.get(key)
+    return [tokens[key] for key in keys]
+
+
+def _load_role(user_id, event_id):
+    # Read from the primary: a role cached from a stale replica would outlive the replica's lag.
+    roles = set(Team.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id, event_id=event_id).values_list('role', flat=True))
+
+    if not roles:
+        return None
+    if ORGANIZER in roles:
+        return ORGANIZER
+    return PARTICIPANT
+
+
+def _cached_role(user_id, event_id):
+    cache = _cache()
+    # The tokens are read before the Team rows, so a role loaded before an
+    # invalidation is stored under the token that invalidation replaced.
+    generation, version = _tokens(cache, [CLEAR_KEY, _version_key(user_id, event_id)])
+    key = 'membership:role:%s:%s:%s:%s' % (generation, user_id, event_id, version)
+
+    role = cache.get(key)
+    if role is None:
+        role = _load_role(user_id, event_id) or NO_ROLE
+        cache.set(key, role, _ttl())
+    return role or None
+
+
+def get_role(request, event_id):
+    user = getattr(request, 'user', None)
+
+    if event_id is None or user is None or not user.is_authenticated:
+        return None
+
+    try:
+        event_id = int(event_id)
+    except (TypeError, ValueError):
+        return None
+
+    memo = getattr(request, '_membership_memo', None)
+    if memo is None or memo[0] != _generation:
+        memo = (_generation, {})
+        request._membership_memo = memo
+
+    roles = memo[1]
+    if event_id not in roles:
+        roles[event_id] = _cached_role(user.pk, event_id)
+    return roles[event_id]
+
+
+def is_member(request, event_id):
+    return get_role(request, event_id) is not None
+
+
+def is_organizer(request, event_id):
+    return get_role(request, event_id) == ORGANIZER
+
+
+def _bump_generation():
+    global _generation
+
+    with _lock:
+        _generation += 1
+
+
+def _replace_version(user_id, event_id):
+    _cache().set(_version_key(user_id, event_id), uuid.uuid4().hex, None)
+    _bump_generation()
+
+
+def invalidate(user_id, event_id):
+    _replace_version(user_id, event_id)
+    # A request that read the old row before the writing transaction
+    # committed could have cached it under the new token in the meantime.
+    transaction.on_commit(lambda: _replace_version(user_id, event_id))
+
+
+def clear():
+    _cache().set(CLEAR_KEY, uuid.uuid4().hex, None)
+    _bump_generation()
@@ -0,0 +1,181 @@
+"""
+Per-endpoint request, SQL query and latency metrics.
+
+Queries are counted by an execute wrapper installed on every database
+connection (see signals.py). The wrapper reports into a context variable
+set by QueryMetricsMiddleware, so queries issued from sync_to_async threads
+are attributed to the request that issued them.
+"""
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current_request = contextvars.ContextVar('coeventplanner_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def quantile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class EndpointStats:
+    def __init__(self, sample_size):
+        self.count = 0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.latency = 0.0
+        self.query_samples = deque(maxlen=sample_size)
+        self.sql_samples = deque(maxlen=sample_size)
+        self.latency_samples = deque(maxlen=sample_size)
+
+
+class MetricsRegistry:
+    quantiles = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, url_name, action, queries, sql_time, latency):
+        sample_size = getattr(settings, 'METRICS_SAMPLE_SIZE', 1024)
+
+        with self._lock:
+            stats = self._endpoints.get((url_name, action))
+            if stats is None:
+                stats = self._endpoints[(url_name, action)] = EndpointStats(sample_size)
+
+            stats.count += 1
+            stats.queries += queries
+            stats.sql_time += sql_time
+            stats.latency += latency
+            stats.query_samples.append(queries)
+            stats.sql_samples.append(sql_time)
+            stats.latency_samples.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'count': stats.count,
+                    'queries': stats.queries,
+                    'sql_time': stats.sql_time,
+                    'latency': stats.latency,
+                    'query_samples': list(stats.query_samples),
+                    'sql_samples': list(stats.sql_samples),
+                    'latency_samples': list(stats.latency_samples),
+                }
+                for key, stats in self._endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def labels(url_name, action, **extra):
+            pairs = [('url_name', url_name), ('action', action)] + list(extra.items())
+            return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in pairs)
+
+        counters = [
+            ('coeventplanner_requests_total', 'Requests served.', 'count'),
+            ('coeventplanner_sql_queries_total', 'SQL queries executed.', 'queries'),
+            ('coeventplanner_sql_seconds_total', 'Time spent executing SQL.', 'sql_time'),
+        ]
+        for name, help_text, field in counters:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s counter' % name)
+            for (url_name, action), stats in snapshot:
+                lines.append('%s%s %s' % (name, labels(url_name, action), stats[field]))
+
+        summaries = [
+            ('coeventplanner_request_latency_seconds', 'Total request latency.', 'latency_samples', 'latency'),
+            ('coeventplanner_request_sql_seconds', 'SQL time per request.', 'sql_samples', 'sql_time'),
+            ('coeventplanner_request_sql_queries', 'SQL queries per request.', 'query_samples', 'queries'),
+        ]
+        for name, help_text, samples, total in summaries:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s summary' % name)
+            for (url_name, action), stats in snapshot:
+                for q in self.quantiles:
+                    lines.append('%s%s %s' % (name, labels(url_name, action, quantile=q), quantile(stats[samples], q)))
+                lines.append('%s_sum%s %s' % (name, labels(url_name, action), stats[total]))
+                lines.append('%s_count%s %s' % (name, labels(url_name, action), stats['count']))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current_request.set(stats)
+
+
+def finish_request(request, stats, token, started):
+    _current_request.reset(token)
+    latency = time.perf_counter() - started
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return
+
+    actions = getattr(match.func, 'actions', None) or {}
+    method = request.method.lower()
+    action = actions.get(method, method)
+    registry.record(match.url_name, action, stats.queries, stats.sql_time, latency)
+    check_query_budget(match.url_name, action, stats.queries)
+
+
+def check_query_budget(url_name, action, queries):
+    budgets = getattr(settings, 'ENDPOINT_QUERY_BUDGETS', {})
+    budget = budgets.get('%s:%s' % (url_name, action), budgets.get(url_name))
+
+    if budget is None or queries <= budget:
+        return
+
+    message = '%s:%s ran %d queries, budget is %d' % (url_name, action, queries, budget)
+    if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
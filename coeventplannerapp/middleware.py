@@ -1,7 +1,67 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.utils.deprecation import MiddlewareMixin
 from django.urls import resolve
+from . import metrics, routers
 
 class DisableCSRFOnTokenView(MiddlewareMixin):
     def process_request(self, request):
         if resolve(request.path_info).url_name in ['token_obtain_pair', 'token_refresh']:
-            setattr(request, '_dont_enforce_csrf_checks', True)
\ No newline at end of file
+            setattr(request, '_dont_enforce_csrf_checks', True)
+
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(request, stats, token, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(request, stats, token, started)
+        return response
+
+class ReplicaPinningMiddleware:
+    """Scopes read-your-writes stickiness (see routers.py) to one request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            routers.finish_request(token)
+
+    async def __acall__(self, request):
+        token = routers.start_request()
+        try:
+            return await self.get_response(request)
+        finally:
+            routers.finish_request(token)
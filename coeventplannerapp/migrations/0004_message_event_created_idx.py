@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0003_alter_team_role'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['event', 'created_at', 'id'], name='message_event_created_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:26
+
+from django.db import migrations, models
+
+
+def remove_duplicate_teams(apps, schema_editor):
+    # Keep one row per (user, event), preferring an organizer and then an
+    # accepted invitation, so the unique constraint can be added.
+    Team = apps.get_model('coeventplannerapp', 'Team')
+    seen = set()
+
+    for team in Team.objects.order_by('user_id', 'event_id', 'role', '-invitation_status', 'id'):
+        key = (team.user_id, team.event_id)
+        if key in seen:
+            team.delete()
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0004_message_event_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_teams, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['event', 'status'], name='task_event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['event', 'user', 'role'], name='team_event_user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['user', 'invitation_status'], name='team_user_invitation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', 'event'], name='ticket_user_event_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='team',
+            constraint=models.UniqueConstraint(fields=('user', 'event'), name='team_unique_user_event'),
+        ),
+    ]
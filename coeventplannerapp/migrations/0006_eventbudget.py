@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0005_team_unique_user_event_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventBudget',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='budget', serialize=False, to='coeventplannerapp.event')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('ticket_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0006_eventbudget'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='code',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='TicketBatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('idempotency_key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_batches', to='coeventplannerapp.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='coeventplannerapp.ticketbatch'),
+        ),
+        migrations.AddConstraint(
+            model_name='ticketbatch',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='ticketbatch_unique_user_key'),
+        ),
+    ]
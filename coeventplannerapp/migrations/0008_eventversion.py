@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_event_versions(apps, schema_editor):
+    Event = apps.get_model('coeventplannerapp', 'Event')
+    EventVersion = apps.get_model('coeventplannerapp', 'EventVersion')
+    EventVersion.objects.bulk_create(
+        [EventVersion(event_id=event_id) for event_id in Event.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0007_ticketbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventVersion',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version', serialize=False, to='coeventplannerapp.event')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_event_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:33
+
+from django.db import migrations, models
+
+CREATE_FTS = [
+    "CREATE VIRTUAL TABLE coeventplannerapp_event_fts USING fts5("
+    "title, description, tokenize='porter unicode61')",
+    "CREATE TRIGGER coeventplannerapp_event_fts_insert AFTER INSERT ON coeventplannerapp_event BEGIN "
+    "INSERT INTO coeventplannerapp_event_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER coeventplannerapp_event_fts_update AFTER UPDATE OF title, description ON coeventplannerapp_event BEGIN "
+    "UPDATE coeventplannerapp_event_fts SET title = new.title, description = new.description "
+    "WHERE rowid = old.id; END",
+    "CREATE TRIGGER coeventplannerapp_event_fts_delete AFTER DELETE ON coeventplannerapp_event BEGIN "
+    "DELETE FROM coeventplannerapp_event_fts WHERE rowid = old.id; END",
+    "INSERT INTO coeventplannerapp_event_fts(rowid, title, description) "
+    "SELECT id, title, description FROM coeventplannerapp_event",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS coeventplannerapp_event_fts_insert",
+    "DROP TRIGGER IF EXISTS coeventplannerapp_event_fts_update",
+    "DROP TRIGGER IF EXISTS coeventplannerapp_event_fts_delete",
+    "DROP TABLE IF EXISTS coeventplannerapp_event_fts",
+]
+
+
+def create_event_fts(apps, schema_editor):
+    # FTS5 is SQLite only; other backends search with icontains (see search.py).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_FTS:
+        schema_editor.execute(statement)
+
+
+def drop_event_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_FTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0008_eventversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date', 'id'], name='event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'date'], name='event_location_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['price'], name='event_price_idx'),
+        ),
+        migrations.RunPython(create_event_fts, drop_event_fts),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+from django.db import migrations
+
+# event_id is indexed as a token so that a search can be scoped to one event
+# inside the MATCH expression (see search.search_messages).
+CREATE_FTS = [
+    "CREATE VIRTUAL TABLE coeventplannerapp_message_fts USING fts5("
+    "content, event_id, tokenize='porter unicode61')",
+    "CREATE TRIGGER coeventplannerapp_message_fts_insert AFTER INSERT ON coeventplannerapp_message BEGIN "
+    "INSERT INTO coeventplannerapp_message_fts(rowid, content, event_id) "
+    "VALUES (new.id, new.content, new.event_id); END",
+    "CREATE TRIGGER coeventplannerapp_message_fts_update AFTER UPDATE OF content, event_id ON coeventplannerapp_message BEGIN "
+    "UPDATE coeventplannerapp_message_fts SET content = new.content, event_id = new.event_id "
+    "WHERE rowid = old.id; END",
+    "CREATE TRIGGER coeventplannerapp_message_fts_delete AFTER DELETE ON coeventplannerapp_message BEGIN "
+    "DELETE FROM coeventplannerapp_message_fts WHERE rowid = old.id; END",
+    "INSERT INTO coeventplannerapp_message_fts(rowid, content, event_id) "
+    "SELECT id, content, event_id FROM coeventplannerapp_message",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS coeventplannerapp_message_fts_insert",
+    "DROP TRIGGER IF EXISTS coeventplannerapp_message_fts_update",
+    "DROP TRIGGER IF EXISTS coeventplannerapp_message_fts_delete",
+    "DROP TABLE IF EXISTS coeventplannerapp_message_fts",
+]
+
+
+def create_message_fts(apps, schema_editor):
+    # FTS5 is SQLite only; other backends search with icontains (see search.py).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_FTS:
+        schema_editor.execute(statement)
+
+
+def drop_message_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_FTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0010_messagereadcursor'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_fts, drop_message_fts),
+    ]
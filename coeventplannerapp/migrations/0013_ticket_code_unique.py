@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:20
+
+import secrets
+
+from django.db import migrations, models
+
+
+def regenerate_duplicate_codes(apps, schema_editor):
+    # Codes used to be supplied by clients. Keep the oldest ticket's code and
+    # give every later ticket sharing it a new one, so the column can be
+    # made unique.
+    Ticket = apps.get_model('coeventplannerapp', 'Ticket')
+    codes = set(Ticket.objects.values_list('code', flat=True))
+    seen = set()
+
+    for ticket in Ticket.objects.order_by('code', 'id').only('id', 'code'):
+        if ticket.code not in seen:
+            seen.add(ticket.code)
+            continue
+
+        code = secrets.token_urlsafe(12)
+        while code in codes:
+            code = secrets.token_urlsafe(12)
+        codes.add(code)
+        Ticket.objects.filter(pk=ticket.pk).update(code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0012_archivedmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(regenerate_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ticket',
+            name='code',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_event_budgets(apps, schema_editor):
+    Event = apps.get_model('coeventplannerapp', 'Event')
+    BudgetItem = apps.get_model('coeventplannerapp', 'BudgetItem')
+    Ticket = apps.get_model('coeventplannerapp', 'Ticket')
+    EventBudget = apps.get_model('coeventplannerapp', 'EventBudget')
+
+    item_totals = {
+        row['event']: row
+        for row in BudgetItem.objects.values('event').annotate(total=Sum('amount'), item_count=Count('id'))
+    }
+    ticket_counts = dict(Ticket.objects.values('event').annotate(ticket_count=Count('id')).values_list('event', 'ticket_count'))
+
+    budgets = []
+    for event_id in Event.objects.filter(budget__isnull=True).values_list('id', flat=True):
+        item_row = item_totals.get(event_id, {})
+        budgets.append(EventBudget(
+            event_id=event_id,
+            total=item_row.get('total') or 0,
+            item_count=item_row.get('item_count', 0),
+            ticket_count=ticket_counts.get(event_id, 0),
+        ))
+    EventBudget.objects.bulk_create(budgets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0013_ticket_code_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_event_budgets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:08
+
+import coeventplannerapp.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0014_backfill_event_budgets'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', coeventplannerapp.models.UserManager()),
+            ],
+        ),
+    ]
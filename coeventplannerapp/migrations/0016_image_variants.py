@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+# Adding a column with a callable default makes SQLite rebuild the event and
+# message tables, which drops the triggers keeping the FTS tables from 0009
+# and 0011 in sync. The FTS rows themselves survive, so only the triggers are
+# recreated, after the rebuild in both directions.
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_event_fts_insert AFTER INSERT ON coeventplannerapp_event BEGIN "
+    "INSERT INTO coeventplannerapp_event_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_event_fts_update AFTER UPDATE OF title, description ON coeventplannerapp_event BEGIN "
+    "UPDATE coeventplannerapp_event_fts SET title = new.title, description = new.description "
+    "WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_event_fts_delete AFTER DELETE ON coeventplannerapp_event BEGIN "
+    "DELETE FROM coeventplannerapp_event_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_message_fts_insert AFTER INSERT ON coeventplannerapp_message BEGIN "
+    "INSERT INTO coeventplannerapp_message_fts(rowid, content, event_id) "
+    "VALUES (new.id, new.content, new.event_id); END",
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_message_fts_update AFTER UPDATE OF content, event_id ON coeventplannerapp_message BEGIN "
+    "UPDATE coeventplannerapp_message_fts SET content = new.content, event_id = new.event_id "
+    "WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS coeventplannerapp_message_fts_delete AFTER DELETE ON coeventplannerapp_message BEGIN "
+    "DELETE FROM coeventplannerapp_message_fts WHERE rowid = old.id; END",
+]
+
+
+def create_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coeventplannerapp', '0015_user_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, create_fts_triggers),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(create_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
+from django.db import models, transaction
 
 STATUS_CHOICES = [
         ('not_started', 'Not Started'),
@@ -12,8 +12,27 @@ ROLE_CHOICES = [
         ('participant', 'Participant'),
     ]
 
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() sends no signals, so the cached JWT users (see
+        # authentication.py) are dropped here instead. Also covers bulk_update().
+        from . import authentication
+
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        for user_id in user_ids:
+            authentication.invalidate(user_id)
+        return rows
+
+
+class UserManager(AuthUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     image = models.ImageField(upload_to='user_images/', blank=True, null=True)
+    # Names of the saved thumbnail/WebP variants of image, see images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     job_title = models.CharField(max_length=64, blank=True, null=True)
     groups = models.ManyToManyField(
         'auth.Group',
@@ -30,16 +49,27 @@ class User(AbstractUser):
         verbose_name='user permissions',
     )
 
+    objects = UserManager()
+
 
 class Event(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=64)
     description = models.TextField()
     image = models.ImageField(upload_to='event_images/', blank=True, null=True)
+    # Names of the saved thumbnail/WebP variants of image, see images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     location = models.CharField(max_length=64)
     date = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='event_date_idx'),
+            models.Index(fields=['location', 'date'], name='event_location_date_idx'),
+            models.Index(fields=['price'], name='event_price_idx'),
+        ]
+
 class Task(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=64)
@@ -48,6 +78,11 @@ class Task(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="tasks")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tasks")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'status'], name='task_event_status_idx'),
+        ]
+
 class Team(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="teams")
@@ -55,6 +90,15 @@ class Team(models.Model):
     role = models.CharField(max_length=64, choices=ROLE_CHOICES, default='participant')
     invitation_status = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event'], name='team_unique_user_event'),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'user', 'role'], name='team_event_user_role_idx'),
+            models.Index(fields=['user', 'invitation_status'], name='team_user_invitation_idx'),
+        ]
+
 class BudgetItem(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=64)
@@ -62,16 +106,102 @@ class BudgetItem(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="budget_items")
 
+    def save(self, *args, **kwargs):
+        # Keeps the EventBudget rollup update (see signals.py) in the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class TicketBatch(models.Model):
+    id = models.AutoField(primary_key=True)
+    idempotency_key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ticket_batches")
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="ticket_batches")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='ticketbatch_unique_user_key'),
+        ]
+
 class Ticket(models.Model):
     id = models.AutoField(primary_key=True)
-    code = models.CharField(max_length=64)
+    code = models.CharField(max_length=64, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tickets")
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="tickets")
+    batch = models.ForeignKey(TicketBatch, on_delete=models.SET_NULL, blank=True, null=True, related_name="tickets")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'event'], name='ticket_user_event_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keeps the EventBudget rollup update (see signals.py) in the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 class Message(models.Model):
     id = models.AutoField(primary_key=True)
     content = models.TextField()
     image = models.ImageField(upload_to='message_images/', blank=True, null=True)
+    # Names of the saved thumbnail/WebP variants of image, see images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="messages")
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="messages")
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'created_at', 'id'], name='message_event_created_idx'),
+        ]
+
+class ArchivedMessage(models.Model):
+    """
+    A Message moved out of the hot table by the archive_messages command,
+    under its original id. Nothing listens to its signals, so deleting an
+    event removes its archive with a single DELETE.
+    """
+    id = models.IntegerField(primary_key=True)
+    content = models.TextField()
+    image = models.ImageField(upload_to='message_images/', blank=True, null=True)
+    # Names of the saved thumbnail/WebP variants of image, see images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_messages")
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="archived_messages")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'created_at', 'id'], name='archived_message_event_idx'),
+        ]
+
+class MessageReadCursor(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="message_read_cursors")
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="message_read_cursors")
+    # (created_at, id) of the last message read, the order messages are paged in.
+    last_read_at = models.DateTimeField()
+    last_read_id = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event'], name='read_cursor_unique_user_event'),
+        ]
+
+class EventBudget(models.Model):
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name="budget")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    ticket_count = models.PositiveIntegerField(default=0)
+
+    @property
+    def ticket_revenue(self):
+        return self.ticket_count * self.event.price
+
+    @property
+    def balance(self):
+        return self.ticket_revenue - self.total
+
+class EventVersion(models.Model):
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name="version")
+    version = models.PositiveBigIntegerField(default=0)
@@ -0,0 +1,152 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id).
+
+    Without a cursor the newest page is returned. `before` walks back through
+    older messages and `after` walks forward to newer ones. Each page is
+    returned oldest first, the order a chat pane renders it in.
+
+    When an `archive` queryset is given, it holds the messages older than
+    every message in `queryset` (see archive.py) and pages read through to it
+    once they run past the oldest message in `queryset`.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, archive=None):
+        page_size = self.start(request)
+        rows = []
+        for source in self.get_sources(queryset, archive):
+            if len(rows) > page_size:
+                break
+            rows.extend(self.get_window(source)[:page_size + 1 - len(rows)])
+        return self.set_page(rows, page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None, archive=None):
+        page_size = self.start(request)
+        rows = []
+        for source in self.get_sources(queryset, archive):
+            if len(rows) > page_size:
+                break
+            rows.extend([row async for row in self.get_window(source)[:page_size + 1 - len(rows)]])
+        return self.set_page(rows, page_size)
+
+    def start(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.before = self.decode_cursor(request.query_params.get(self.before_query_param), self.before_query_param)
+        self.after = self.decode_cursor(request.query_params.get(self.after_query_param), self.after_query_param)
+
+        if self.after is not None:
+            self.forward = True
+            self.has_before = True
+        else:
+            self.forward = False
+            self.has_after = self.before is not None
+        return self.get_page_size(request)
+
+    def get_sources(self, queryset, archive):
+        # In the order the page walks through them.
+        if archive is None:
+            return [queryset]
+        return [archive, queryset] if self.forward else [queryset, archive]
+
+    def get_window(self, queryset):
+        if self.after is not None:
+            created_at, pk = self.after
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            return queryset.order_by('created_at', 'id')
+
+        if self.before is not None:
+            created_at, pk = self.before
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        return queryset.order_by('-created_at', '-id')
+
+    def set_page(self, rows, page_size):
+        page = rows[:page_size]
+        if self.forward:
+            self.has_after = len(rows) > page_size
+        else:
+            self.has_before = len(rows) > page_size
+            page.reverse()
+
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.page or not self.has_after:
+            return None
+        url = remove_query_param(self.base_url, self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.page or not self.has_before:
+            return None
+        url = remove_query_param(self.base_url, self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.encode_cursor(self.page[0]))
+
+    def encode_cursor(self, message):
+        raw = '%s|%d' % (message.created_at.isoformat(), message.id)
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, encoded, param):
+        if not encoded:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            created_at, pk = raw.rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise ValidationError({param: self.invalid_cursor_message})
+
+        if created_at is None:
+            raise ValidationError({param: self.invalid_cursor_message})
+        return created_at, pk
+
+
+class EventPagination(PageNumberPagination):
+    """Page-numbered pages for the public event catalogue."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MessageSearchPagination(PageNumberPagination):
+    """Page-numbered pages of ranked message search results."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
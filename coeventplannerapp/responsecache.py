@@ -0,0 +1,126 @@
+"""
+Response cache for the anonymous event list and detail actions.
+
+Entries live in Django's cache framework (EVENT_CACHE_ALIAS) and are keyed
+by host, path and query string under a generation token. Saving or deleting
+an Event replaces the token of that event and of the list, which orphans
+their entries without having to enumerate keys. With a per-process backend
+such as locmem, other processes only see the change once EVENT_CACHE_TIMEOUT
+expires; use a shared backend when running several workers. Entries are
+computed from the primary database: one built from a replica snapshot taken
+before a write would be stored under the generation that write started.
+
+Each entry carries a soft expiry. The first request past it takes a short
+lock (cache.add) and recomputes while concurrent requests keep serving the
+stale copy, so an expiry under load triggers one recompute. With no copy to
+serve, concurrent requests wait up to LOCK_WAIT for the lock holder's entry
+and then compute their own.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+LIST_GENERATION_KEY = 'event-cache:gen:list'
+LOCK_TIMEOUT = 30
+# How long a cold miss waits for a concurrent computation of the same entry
+# before computing it too. Short, so a slow or crashed holder of the lock
+# delays other requests by no more than this.
+LOCK_WAIT = 0.1
+LOCK_POLL = 0.02
+
+
+def _cache():
+    return caches[getattr(settings, 'EVENT_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'EVENT_CACHE_TIMEOUT', 60)
+
+
+def _generation(key):
+    cache = _cache()
+    generation = cache.get(key)
+    if generation is None:
+        # Never fall back to a fixed default: an evicted token must not
+        # revive entries written under an older one.
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _event_generation_key(event_id):
+    return 'event-cache:gen:%s' % event_id
+
+
+def invalidate_event(event_id):
+    cache = _cache()
+    cache.set(_event_generation_key(event_id), uuid.uuid4().hex, None)
+    cache.set(LIST_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def _request_key(request, scope, generation):
+    query = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    digest = hashlib.md5(repr((request.get_host(), request.path, query)).encode()).hexdigest()
+    return 'event-cache:%s:%s:%s' % (scope, generation, digest)
+
+
+def list_key(request):
+    return _request_key(request, 'list', _generation(LIST_GENERATION_KEY))
+
+
+def detail_key(request, event_id):
+    return _request_key(request, 'detail:%s' % event_id, _generation(_event_generation_key(event_id)))
+
+
+def _store(cache, key, compute):
+    response = compute()
+    if response.status_code == status.HTTP_200_OK:
+        timeout = _timeout()
+        # The hard timeout leaves room to serve the entry stale while it is recomputed.
+        cache.set(key, (time.time() + timeout, response.data), timeout * 2)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def _hit(data, state):
+    response = Response(data)
+    response['X-Cache'] = state
+    return response
+
+
+def cached_response(key, compute):
+    cache = _cache()
+    entry = cache.get(key)
+    lock_key = key + ':lock'
+
+    if entry is not None:
+        expires_at, data = entry
+        if expires_at > time.time():
+            return _hit(data, 'HIT')
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return _hit(data, 'STALE')
+        try:
+            return _store(cache, key, compute)
+        finally:
+            cache.delete(lock_key)
+
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _store(cache, key, compute)
+        finally:
+            cache.delete(lock_key)
+
+    # Someone else is computing this entry; wait briefly for it.
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return _hit(entry[1], 'HIT')
+
+    return _store(cache, key, compute)
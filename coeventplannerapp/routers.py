@@ -0,0 +1,77 @@
+"""
+Sends reads to a replica database alias and writes to the primary.
+
+Reads go to the primary instead once the current request has written
+anything (read-your-writes), and while the primary is inside a transaction,
+so that signal handlers reading rows they are about to change never see a
+stale copy. ReplicaPinningMiddleware scopes the stickiness to one request;
+outside a request it lasts for the rest of the current context. Without a
+DATABASE_REPLICA_ALIAS database configured every query uses the primary.
+
+Nothing here copies data: the replica is a snapshot of the primary taken by
+`manage.py sync_replica` (SQLite's online backup API), so run that command
+as often as reads may lag behind writes, e.g. every few seconds from a
+scheduler. Lookups whose results are cached across requests, membership
+roles, authenticated users, cached event responses and ETagged bodies
+(see versions.py), always read the primary so that a stale snapshot is
+never cached.
+"""
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Holds a one-item list per request, so that writes made inside
+# sync_to_async() calls pin the whole request.
+_pinned = contextvars.ContextVar('replica_pinned', default=None)
+
+
+def _replica():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in connections.settings else None
+
+
+def start_request():
+    return _pinned.set([False])
+
+
+def finish_request(token):
+    _pinned.reset(token)
+
+
+def pin():
+    state = _pinned.get()
+    if state is None:
+        _pinned.set([True])
+    else:
+        state[0] = True
+
+
+def is_pinned():
+    state = _pinned.get()
+    return state is not None and state[0]
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = _replica()
+        if replica is None or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        databases = {DEFAULT_DB_ALIAS, _replica()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the schema along with the data when sync_replica copies the primary.
+        if db == _replica():
+            return False
+        return None
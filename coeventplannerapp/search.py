@@ -0,0 +1,102 @@
+"""
+Full-text search backed by SQLite FTS5 shadow tables.
+
+The tables and the triggers that keep them in sync with their source rows
+are created by migrations, so inserts, updates and deletes from any code
+path (including bulk_create and queryset updates) are indexed. On other
+database backends search falls back to icontains filters.
+
+Only the hot Message table is indexed: messages moved to ArchivedMessage
+(see archive.py) drop out of search_messages results.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.html import escape
+
+EVENT_FTS_TABLE = 'coeventplannerapp_event_fts'
+MESSAGE_FTS_TABLE = 'coeventplannerapp_message_fts'
+
+# snippet() wraps matches in these, so that the text around them can be
+# HTML-escaped before they become <mark> tags.
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query that matches every word as a prefix.
+    User input is never passed through as FTS5 syntax.
+    """
+    tokens = _TOKEN.findall(text or '')
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+def fts_available(queryset):
+    return connections[queryset.db].vendor == 'sqlite'
+
+
+def search_events(queryset, text):
+    """Filter events to those matching `text`, best matches first."""
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+
+    if not fts_available(queryset):
+        words = _TOKEN.findall(text)
+        condition = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(description__icontains=word)
+        return queryset.filter(condition)
+
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[EVENT_FTS_TABLE],
+        where=['%s.rowid = %s.id' % (EVENT_FTS_TABLE, table), '%s MATCH %%s' % EVENT_FTS_TABLE],
+        params=[query],
+        # bm25 weights: title matches count three times as much as description ones.
+        select={'search_rank': 'bm25(%s, 3.0, 1.0)' % EVENT_FTS_TABLE},
+        order_by=['search_rank', 'id'],
+    )
+
+
+def search_messages(queryset, event_id, text):
+    """
+    Filter an event's messages to those matching `text`, best matches first,
+    with a `search_snippet` attribute (see highlight()). The event id is
+    indexed as a token of its own, so the event scope is resolved by the
+    FTS index. Filtering on the message table's event_id as well would make
+    SQLite walk every message of the event and probe the FTS table per row.
+    """
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+
+    if not fts_available(queryset):
+        condition = Q(event_id=event_id)
+        for word in _TOKEN.findall(text):
+            condition &= Q(content__icontains=word)
+        return queryset.filter(condition).extra(select={'search_snippet': 'NULL'}).order_by('-created_at', '-id')
+
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[MESSAGE_FTS_TABLE],
+        where=['%s.rowid = %s.id' % (MESSAGE_FTS_TABLE, table), '%s MATCH %%s' % MESSAGE_FTS_TABLE],
+        params=['event_id : "%d" AND content : (%s)' % (int(event_id), query)],
+        select={
+            # The event_id column only scopes the match and does not count towards the rank.
+            'search_rank': 'bm25(%s, 1.0, 0.0)' % MESSAGE_FTS_TABLE,
+            'search_snippet': "snippet(%s, 0, char(2), char(3), '…', 16)" % MESSAGE_FTS_TABLE,
+        },
+        order_by=['search_rank', '-id'],
+    )
+
+
+def highlight(snippet):
+    """An FTS snippet as escaped HTML with the matches wrapped in <mark> tags."""
+    if snippet is None:
+        return None
+    return escape(snippet).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')
@@ -1,10 +1,47 @@
 from rest_framework import serializers
-from .models import User, Event, Task, Team, BudgetItem, Ticket, Message
+from .models import User, Event, Task, Team, BudgetItem, Ticket, Message, EventBudget
+from .images import variants_storage
+from . import sparse
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the saved thumbnail and WebP variants of an image, read from the
+    model's image_variants names (see images.py). None until there are any.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        storage = variants_storage(sparse.model_field(self.parent.Meta.model, self.source_attrs))
+        request = self.context.get('request', None)
+        urls = {}
+        for variant, name in value.items():
+            url = storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+class SparseFieldsMixin:
+    """Drops the fields a GET request did not ask for, see sparse.py."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = sparse.selected_fields(type(self), self.context.get('request', None))
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
-class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'password', 'image', 'job_title', 'groups', 'user_permissions']
+        fields = ['id', 'username', 'email', 'password', 'image', 'image_variants', 'job_title', 'groups', 'user_permissions']
     
     def create(self, validated_data):
         print(validated_data)
@@ -31,12 +68,13 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     role = serializers.CharField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Event
-        fields = ['id', 'title', 'description', 'image', 'price', 'location', 'date', 'role']
+        fields = ['id', 'title', 'description', 'image', 'image_variants', 'price', 'location', 'date', 'role']
     
     def create(self, validated_data):
         request = self.context.get('request')
@@ -45,35 +83,67 @@ class EventSerializer(serializers.ModelSerializer):
         Team.objects.create(user=user, event=event, role='organizer', invitation_status=True)
         return event
 
-class TaskSerializer(serializers.ModelSerializer):
+class DashboardEventSerializer(EventSerializer):
+    task_counts = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta(EventSerializer.Meta):
+        fields = EventSerializer.Meta.fields + ['task_counts']
+
+class OrganizerEventSerializer(DashboardEventSerializer):
+    member_count = serializers.IntegerField(read_only=True)
+    pending_invitation_count = serializers.IntegerField(read_only=True)
+    tickets_sold = serializers.IntegerField(read_only=True)
+
+    class Meta(DashboardEventSerializer.Meta):
+        fields = DashboardEventSerializer.Meta.fields + ['member_count', 'pending_invitation_count', 'tickets_sold']
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     image = serializers.ImageField(source='user.image', read_only=True)
+    image_variants = ImageVariantsField(source='user.image_variants')
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'status', 'event', 'user', 'username', 'image']
+        fields = ['id', 'title', 'description', 'status', 'event', 'user', 'username', 'image', 'image_variants']
+        expandable = {'user': ['username', 'image', 'image_variants']}
         read_only_fields = ['username', 'image']
     
     def create(self, validated_data):
         task = Task.objects.create(**validated_data)
         return task
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     image = serializers.ImageField(source='user.image', read_only=True)
     event_title = serializers.CharField(source='event.title', read_only=True)
     event_image = serializers.ImageField(source='event.image', read_only=True)
+    image_variants = ImageVariantsField(source='user.image_variants')
+    event_image_variants = ImageVariantsField(source='event.image_variants')
 
     class Meta:
         model = Team
-        fields = ['id', 'user', 'event', 'role', 'invitation_status', 'username', 'image', 'event_title', 'event_image']
+        fields = ['id', 'user', 'event', 'role', 'invitation_status', 'username', 'image', 'event_title', 'event_image', 'image_variants', 'event_image_variants']
+        expandable = {
+            'user': ['username', 'image', 'image_variants'],
+            'event': ['event_title', 'event_image', 'event_image_variants'],
+        }
 
-class BudgetItemSerializer(serializers.ModelSerializer):
+class BudgetItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = BudgetItem
         fields = ['id', 'title', 'description', 'amount', 'event']
 
-class TicketSerializer(serializers.ModelSerializer):
+class EventBudgetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    ticket_price = serializers.DecimalField(source='event.price', max_digits=10, decimal_places=2, read_only=True)
+    ticket_revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = EventBudget
+        fields = ['event', 'total', 'item_count', 'ticket_count', 'ticket_price', 'ticket_revenue', 'balance']
+        expandable = {'event': ['ticket_price', 'ticket_revenue', 'balance']}
+
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     event_title = serializers.CharField(source='event.title', read_only=True)
     event_date = serializers.DateTimeField(source='event.date', read_only=True)
     event_location = serializers.CharField(source='event.location', read_only=True)
@@ -82,11 +152,15 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ['id', 'code', 'user', 'event', 'event_title', 'event_date', 'event_location', 'event_price']
+        expandable = {'event': ['event_title', 'event_date', 'event_location', 'event_price']}
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender_username = serializers.CharField(source='sender.username', read_only=True)
     sender_image = serializers.ImageField(source='sender.image', read_only=True)
+    image_variants = ImageVariantsField()
+    sender_image_variants = ImageVariantsField(source='sender.image_variants')
 
     class Meta:
         model = Message
-        fields = ['id', 'content', 'image', 'created_at', 'sender', 'event', 'sender_username', 'sender_image']
\ No newline at end of file
+        fields = ['id', 'content', 'image', 'image_variants', 'created_at', 'sender', 'event', 'sender_username', 'sender_image', 'sender_image_variants']
+        expandable = {'sender': ['sender_username', 'sender_image', 'sender_image_variants']}
\ No newline at end of file
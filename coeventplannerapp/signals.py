@@ -0,0 +1,185 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import User, Event, Task, Team, BudgetItem, Ticket, Message, EventBudget, EventVersion
+from . import authentication, budget, images, membership, metrics, responsecache, versions
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def invalidate_team_membership(sender, instance, **kwargs):
+    membership.invalidate(instance.user_id, instance.event_id)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    metrics.install_query_recorder(connection)
+
+
+@receiver(post_save, sender=Event)
+def create_event_budget(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EventBudget.objects.get_or_create(event=instance)
+
+
+@receiver(pre_save, sender=BudgetItem)
+def remember_previous_budget_item(sender, instance, raw=False, **kwargs):
+    instance._budget_previous = None
+    if instance.pk and not raw:
+        instance._budget_previous = BudgetItem.objects.filter(pk=instance.pk).values('event_id', 'amount').first()
+    instance._previous_event_id = instance._budget_previous['event_id'] if instance._budget_previous else None
+
+
+@receiver(post_save, sender=BudgetItem)
+def update_budget_on_item_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_budget_previous', None)
+
+    if not previous:
+        budget.budget_items_changed(instance.event_id, instance.amount, 1)
+    elif previous['event_id'] == instance.event_id:
+        budget.budget_items_changed(instance.event_id, instance.amount - previous['amount'], 0)
+    else:
+        budget.budget_items_changed(previous['event_id'], -previous['amount'], -1)
+        budget.budget_items_changed(instance.event_id, instance.amount, 1)
+
+
+@receiver(post_delete, sender=BudgetItem)
+def update_budget_on_item_delete(sender, instance, **kwargs):
+    budget.budget_items_changed(instance.event_id, -instance.amount, -1)
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_previous_ticket(sender, instance, raw=False, **kwargs):
+    instance._budget_previous = None
+    if instance.pk and not raw:
+        instance._budget_previous = Ticket.objects.filter(pk=instance.pk).values('event_id').first()
+    instance._previous_event_id = instance._budget_previous['event_id'] if instance._budget_previous else None
+
+
+@receiver(post_save, sender=Ticket)
+def update_budget_on_ticket_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_budget_previous', None)
+    if previous and previous['event_id'] != instance.event_id:
+        budget.tickets_changed(previous['event_id'], -1)
+        budget.tickets_changed(instance.event_id, 1)
+    elif not previous:
+        budget.tickets_changed(instance.event_id, 1)
+
+
+@receiver(post_delete, sender=Ticket)
+def update_budget_on_ticket_delete(sender, instance, **kwargs):
+    budget.tickets_changed(instance.event_id, -1)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=Message)
+def remember_previous_image(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_image_variants = None
+    if not instance.pk or raw or (update_fields is not None and 'image' not in update_fields):
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values('image', 'image_variants').first()
+    # A new upload is only given its final name when the row is saved.
+    if previous is not None and (not instance.image._committed or (instance.image.name or '') != (previous['image'] or '')):
+        instance._previous_image_variants = previous['image_variants']
+        # Never link the old image's variants from the new one.
+        instance.image_variants = {}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Message)
+def generate_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+
+    replaced = getattr(instance, '_previous_image_variants', None)
+    if replaced is not None:
+        images.delete_variants(instance.image.storage, replaced)
+    if replaced is not None or not instance.image_variants:
+        images.schedule_variants(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Message)
+def delete_image_variants(sender, instance, **kwargs):
+    images.delete_variants(instance.image.storage, instance.image_variants)
+
+
+@receiver(images.variants_saved)
+def bump_versions_for_image_variants(sender, instance, **kwargs):
+    # Variant URLs are part of the ETagged and cached payloads.
+    if sender is Event:
+        versions.bump(instance.id)
+        responsecache.invalidate_event(instance.id)
+    elif sender is User:
+        versions.bump_for_user(instance.id)
+    else:
+        versions.bump(instance.event_id)
+
+
+@receiver(post_save, sender=Event)
+def bump_event_version(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        EventVersion.objects.get_or_create(event=instance)
+    else:
+        versions.bump(instance.id)
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Team)
+@receiver(pre_save, sender=Message)
+def remember_previous_event(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_event_id = None
+    if instance.pk and not raw and (update_fields is None or 'event' in update_fields):
+        instance._previous_event_id = sender.objects.filter(pk=instance.pk).values_list('event_id', flat=True).first()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=BudgetItem)
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=BudgetItem)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Message)
+def bump_related_event_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_event_id = getattr(instance, '_previous_event_id', None)
+    if previous_event_id and previous_event_id != instance.event_id:
+        versions.bump(previous_event_id, instance.event_id)
+    else:
+        versions.bump(instance.event_id)
+
+
+@receiver(post_save, sender=User)
+def bump_user_event_versions(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Usernames and avatars are embedded in team, task and message payloads.
+    if raw or created or (update_fields is not None and not {'username', 'image'} & set(update_fields)):
+        return
+    versions.bump_for_user(instance.id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_response_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        responsecache.invalidate_event(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, raw=False, **kwargs):
+    if not raw:
+        authentication.invalidate(instance.pk)
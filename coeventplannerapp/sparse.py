@@ -0,0 +1,109 @@
+"""
+Sparse fieldsets for GET requests.
+
+?fields=id,status restricts a serializer's output to the named fields.
+Fields that come from related objects are grouped under the serializer's
+Meta.expandable (e.g. 'user' for username and image), and ?expand=user adds
+a whole group back. Without ?fields= every field is returned as before.
+Names the serializer does not have are ignored, and a selection left with
+no known names returns every field too.
+
+optimize() derives select_related() and only() from the selected fields,
+so unrequested joins and columns are never fetched. Foreign key columns of
+the model itself are always loaded because permission checks read them.
+"""
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _names(request, param):
+    value = request.GET.get(param)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def selected_fields(serializer_class, request):
+    """The field names requested for `serializer_class`, or None for all of them."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+
+    fields = _names(request, FIELDS_PARAM)
+    if fields is None:
+        return None
+
+    selected = set(fields)
+    groups = getattr(serializer_class.Meta, 'expandable', {})
+    for group in _names(request, EXPAND_PARAM) or []:
+        selected.update(groups.get(group, ()))
+
+    # Dropping unknown names also bounds the caches keyed on the selection,
+    # such as fastpath.mapper_for(), by the serializer's own fields.
+    selected = frozenset(selected) & frozenset(name for name, source, source_attrs in _sources(serializer_class))
+    return selected or None
+
+
+def model_field(model, source_attrs):
+    for attr in source_attrs[:-1]:
+        model = model._meta.get_field(attr).related_model
+    return model._meta.get_field(source_attrs[-1])
+
+
+@functools.lru_cache(maxsize=None)
+def _sources(serializer_class):
+    return [(field.field_name, field.source, tuple(field.source_attrs)) for field in serializer_class()._readable_fields]
+
+
+def optimize(queryset, serializer_class, request):
+    selected = selected_fields(serializer_class, request)
+    if selected is None:
+        return queryset
+
+    model = queryset.model
+    only = {model._meta.pk.name}
+    only.update(field.name for field in model._meta.concrete_fields if field.is_relation)
+    related = set()
+
+    for name, source, source_attrs in _sources(serializer_class):
+        if name not in selected:
+            continue
+        if source == '*':
+            return queryset
+
+        try:
+            model_field(model, source_attrs)
+        except FieldDoesNotExist:
+            # Annotations and attributes set by the view.
+            continue
+
+        if len(source_attrs) > 1:
+            related.add('__'.join(source_attrs[:-1]))
+        only.add('__'.join(source_attrs))
+
+    queryset = queryset.select_related(None)
+    if related:
+        # select_related() without arguments would follow every foreign key.
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+class SparseFieldsViewMixin:
+    """
+    Applies optimize() after the viewset's own get_queryset() has built the
+    queryset: in filter_queryset() for list and get_object(), and in
+    get_serializer() for actions that hand a queryset straight to it.
+    """
+
+    def filter_queryset(self, queryset):
+        return optimize(super().filter_queryset(queryset), self.get_serializer_class(), self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            args = (optimize(args[0], self.get_serializer_class(), self.request),) + args[1:]
+        return super().get_serializer(*args, **kwargs)
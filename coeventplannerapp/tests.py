@@ -1,3 +1,1790 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextlib
+import csv
+import datetime
+import decimal
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, QuerySet, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import archive, authentication, budget, fastpath, images, membership, metrics, responsecache, routers, search, versions, views
+from .authentication import CachedJWTAuthentication
+from .broker import MessageBroker
+from .management.commands import bench
+from .management.commands.bench_concurrency import reload_urls
+from .models import User, Event, Task, Team, BudgetItem, EventBudget, EventVersion, Ticket, Message, ArchivedMessage, MessageReadCursor
+from .pagination import EventPagination, MessageCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import TaskSerializer, TeamSerializer, BudgetItemSerializer, TicketSerializer, MessageSerializer
+from .views import EventViewSet, TaskViewSet, TeamViewSet, BudgetItemViewSet, TicketViewSet, MessageViewSet
+
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)\w+')
+
+
+def make_event(title='Launch', save=True, **fields):
+    event = Event(**{
+        'title': title, 'description': '', 'price': 10, 'location': 'Cairo',
+        'date': datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc),
+        **fields,
+    })
+    if save:
+        event.save()
+    return event
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+def view_queryset(viewset, action, user, **kwargs):
+    request = Request(APIRequestFactory().get('/'))
+    request.user = user
+    view = viewset(action=action, kwargs=kwargs, request=request, format_kwarg=None)
+    return view.get_queryset()
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every hot queryset must be answered from an index. SQLite reports a
+    full table scan as 'SCAN <table>' in EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', 'planner@example.com', 'password')
+        cls.event = make_event(description='Launch party')
+        Team.objects.create(user=cls.user, event=cls.event, role='organizer', invitation_status=True)
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(FULL_SCAN.search(plan), '%s\n\n%s' % (queryset.query, plan))
+
+    def test_membership_lookup(self):
+        self.assertIndexed(Team.objects.filter(user_id=self.user.id, event_id=self.event.id).values_list('role', flat=True))
+
+    def test_organizer_events(self):
+        self.assertIndexed(view_queryset(EventViewSet, 'organizer_events', self.user))
+
+    def assertFastPathIndexed(self, serializer_class, queryset, columns=()):
+        # The values_list query the fast path runs, see fastpath.RowMapper.
+        self.assertIndexed(fastpath.mapper_for(serializer_class, None, columns).fetch(queryset))
+
+    def test_event_tasks(self):
+        self.assertFastPathIndexed(TaskSerializer, view_queryset(TaskViewSet, 'event_tasks', self.user, event_id=self.event.id))
+
+    def test_event_teams(self):
+        self.assertFastPathIndexed(TeamSerializer, view_queryset(TeamViewSet, 'event_teams', self.user, event_id=self.event.id))
+
+    def test_pending_teams(self):
+        self.assertIndexed(view_queryset(TeamViewSet, 'pending_teams', self.user))
+
+    def test_event_budgetitems(self):
+        self.assertIndexed(view_queryset(BudgetItemViewSet, 'event_budgetitems', self.user, event_id=self.event.id))
+
+    def test_event_tickets(self):
+        self.assertIndexed(view_queryset(TicketViewSet, 'event_tickets', self.user, event_id=self.event.id))
+
+    def test_user_tickets(self):
+        self.assertFastPathIndexed(TicketSerializer, view_queryset(TicketViewSet, 'user_tickets', self.user, user_id=self.user.id))
+
+    def test_event_messages_newest_page(self):
+        queryset = view_queryset(MessageViewSet, 'event_messages', self.user, event_id=self.event.id)
+        self.assertFastPathIndexed(MessageSerializer, queryset.order_by('-created_at', '-id')[:51], views.CURSOR_COLUMNS)
+        archived = ArchivedMessage.objects.filter(event=self.event.id).order_by('-created_at', '-id')[:51]
+        self.assertFastPathIndexed(MessageSerializer, archived, views.CURSOR_COLUMNS)
+
+    def test_exports(self):
+        for serializer_class, model in [
+            (TaskSerializer, Task), (TeamSerializer, Team), (BudgetItemSerializer, BudgetItem), (TicketSerializer, Ticket),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assertFastPathIndexed(serializer_class, model.objects.filter(event=self.event.id).order_by('id'))
+
+
+class TeamConstraintTests(TestCase):
+    """A user has at most one Team row per event."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.user, event=cls.event, role='organizer', invitation_status=True)
+
+    def test_database_rejects_duplicates(self):
+        with self.assertRaises(IntegrityError):
+            Team.objects.create(user=self.user, event=self.event, role='participant')
+
+    def test_serializer_rejects_duplicates(self):
+        serializer = TeamSerializer(data={'user': self.user.id, 'event': self.event.id, 'role': 'participant'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('non_field_errors', serializer.errors)
+
+
+class DashboardTests(TestCase):
+    """/api/me/dashboard/ costs the same number of queries however many events the user is in."""
+
+    QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('dashboard', 'dashboard@example.com', 'password')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_event(self, index, accepted=True):
+        event = make_event('Event %d' % index, date=datetime.datetime(2030, 1, 1 + index, tzinfo=datetime.timezone.utc))
+        Team.objects.create(user=self.user, event=event, role='participant', invitation_status=accepted)
+        Task.objects.create(title='Task', description='', status='in_progress', event=event, user=self.user)
+        Ticket.objects.create(code='code-%d' % index, user=self.user, event=event)
+        return event
+
+    def get_dashboard(self):
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get('/api/me/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_is_constant(self):
+        self.add_event(0)
+        self.assertEqual(len(self.get_dashboard()['events']), 1)
+
+        for index in range(1, 10):
+            self.add_event(index, accepted=index % 2 == 0)
+        data = self.get_dashboard()
+        self.assertEqual(len(data['events']), 10)
+        self.assertEqual(len(data['pending_invitations']), 5)
+        self.assertEqual(len(data['upcoming_tickets']), 10)
+
+    def test_task_counts(self):
+        event = self.add_event(0)
+        Task.objects.create(title='Done', description='', status='completed', event=event, user=self.user)
+        counts = self.get_dashboard()['events'][0]['task_counts']
+        self.assertEqual(counts, {'not_started': 0, 'in_progress': 1, 'completed': 1})
+
+    def test_no_events(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/me/dashboard/')
+        self.assertEqual(response.data, {'events': [], 'pending_invitations': [], 'upcoming_tickets': []})
+
+
+class OrganizerEventsTests(TestCase):
+    """/api/me/events/: the user's events with their role and per-event counts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        member = User.objects.create_user('member', 'member@example.com', 'password')
+        invited = User.objects.create_user('invited', 'invited@example.com', 'password')
+
+        cls.organized = make_event('Organized', date=utc(2030, 3, 1))
+        Team.objects.create(user=cls.user, event=cls.organized, role='organizer', invitation_status=True)
+        Team.objects.create(user=member, event=cls.organized, role='participant', invitation_status=True)
+        Team.objects.create(user=invited, event=cls.organized, role='participant', invitation_status=False)
+        for status_ in ('not_started', 'not_started', 'completed'):
+            Task.objects.create(title='Task', description='', status=status_, event=cls.organized, user=member)
+        Ticket.objects.create(code='A-1', user=member, event=cls.organized)
+        Ticket.objects.create(code='A-2', user=invited, event=cls.organized)
+
+        cls.joined = make_event('Joined', date=utc(2030, 1, 1))
+        Team.objects.create(user=cls.user, event=cls.joined, role='participant', invitation_status=True)
+        make_event('Elsewhere')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        response = self.client.get('/api/me/events/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_roles_and_counts(self):
+        organized, joined = self.get()
+        self.assertEqual([organized['id'], joined['id']], [self.organized.id, self.joined.id])
+        self.assertEqual(
+            {name: organized[name] for name in ('role', 'member_count', 'pending_invitation_count', 'tickets_sold', 'task_counts')},
+            {
+                'role': 'organizer', 'member_count': 2, 'pending_invitation_count': 1, 'tickets_sold': 2,
+                'task_counts': {'not_started': 2, 'in_progress': 0, 'completed': 1},
+            },
+        )
+        self.assertEqual(
+            {name: joined[name] for name in ('role', 'member_count', 'pending_invitation_count', 'tickets_sold', 'task_counts')},
+            {
+                'role': 'participant', 'member_count': 1, 'pending_invitation_count': 0, 'tickets_sold': 0,
+                'task_counts': {'not_started': 0, 'in_progress': 0, 'completed': 0},
+            },
+        )
+
+    def test_role_filter(self):
+        self.assertEqual([event['id'] for event in self.get(role='organizer')], [self.organized.id])
+        self.assertEqual([event['id'] for event in self.get(role='participant')], [self.joined.id])
+        response = self.client.get('/api/me/events/', {'role': 'admin'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('role', response.data)
+
+    def test_ordering(self):
+        self.assertEqual([event['id'] for event in self.get(ordering='date')], [self.joined.id, self.organized.id])
+        self.assertEqual([event['id'] for event in self.get(ordering='-date')], [self.organized.id, self.joined.id])
+        response = self.client.get('/api/me/events/', {'ordering': 'title'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+
+# Cold-cache query counts of the hot endpoints. They must not grow with the
+# number of rows; a regression fails here with QueryBudgetExceeded.
+QUERY_BUDGETS = {
+    'event-detail': 2,
+    'organizer-events': 4,
+    'dashboard': 3,
+    'event-tasks': 3,
+    'event-tasks-board': 5,
+    'event-teams': 3,
+    'pending-teams': 1,
+    'event-budgetitems': 3,
+    'event-budget-summary': 3,
+    'event-tickets': 3,
+    'user-tickets': 1,
+    'event-messages': 4,
+    'event-messages-search': 4,
+    'unread-messages': 2,
+}
+
+
+@override_settings(ENDPOINT_QUERY_BUDGETS=QUERY_BUDGETS, QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+    """The hot endpoints stay within ENDPOINT_QUERY_BUDGETS however many rows they return."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.user, event=cls.event, role='organizer', invitation_status=True)
+
+    def setUp(self):
+        cache.clear()
+        membership.clear()
+        metrics.registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_rows(self, count):
+        for index in range(count):
+            member = User.objects.create_user('member-%d-%d' % (count, index), '', 'password')
+            Team.objects.create(user=member, event=self.event, role='participant')
+            Task.objects.create(title='Task', description='', event=self.event, user=member)
+            BudgetItem.objects.create(title='Item', description='', amount=10, event=self.event)
+            Ticket.objects.create(code='code-%d-%d' % (count, index), user=self.user, event=self.event)
+            Message.objects.create(content='Agenda', sender=member, event=self.event)
+
+    def urls(self):
+        event = self.event.id
+        return [
+            '/api/events/%d/' % event,
+            '/api/me/events/',
+            '/api/me/dashboard/',
+            '/api/events/%d/tasks/' % event,
+            '/api/events/%d/tasks/board/' % event,
+            '/api/events/%d/teams/' % event,
+            '/api/me/teams/pending/',
+            '/api/events/%d/budgetitems/' % event,
+            '/api/events/%d/budget/summary/' % event,
+            '/api/events/%d/tickets/' % event,
+            '/api/users/%d/tickets/' % self.user.id,
+            '/api/events/%d/messages/' % event,
+            '/api/events/%d/messages/search/?q=agenda' % event,
+            '/api/me/messages/unread/',
+        ]
+
+    def test_within_budget(self):
+        for count in (1, 5):
+            self.add_rows(count)
+            for url in self.urls():
+                cache.clear()
+                membership.clear()
+                with self.subTest(url=url, rows=count):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual({key[0] for key in metrics.registry.snapshot()}, set(QUERY_BUDGETS))
+
+    def test_exceeding_raises(self):
+        with self.settings(ENDPOINT_QUERY_BUDGETS={'event-tasks': 0}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get('/api/events/%d/tasks/' % self.event.id)
+
+
+class BoardTests(TestCase):
+    """The task board: paged status columns, assignee counts and bulk moves."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('ann', 'ann@example.com', 'password')
+        cls.participant = User.objects.create_user('bob', 'bob@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.organizer, event=cls.event, role='organizer', invitation_status=True)
+        Team.objects.create(user=cls.participant, event=cls.event, role='participant', invitation_status=True)
+
+        def task(status_, user):
+            return Task.objects.create(title='Task', description='', status=status_, event=cls.event, user=user)
+        cls.todo = [task('not_started', cls.organizer) for _ in range(3)]
+        cls.doing = task('in_progress', cls.participant)
+        cls.done = task('completed', cls.organizer)
+        # The model default, which is not one of STATUS_CHOICES.
+        cls.pending = Task.objects.create(title='Task', description='', event=cls.event, user=cls.participant)
+        cls.elsewhere = Task.objects.create(title='Task', description='', status='not_started', event=make_event('Other'), user=cls.organizer)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.path = '/api/events/%d/tasks/board/' % self.event.id
+
+    def move(self, moves):
+        return self.client.post(self.path + 'move/', {'moves': moves}, format='json')
+
+    def test_columns(self):
+        response = self.client.get(self.path, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        columns = {column['status']: column for column in response.data['columns']}
+        self.assertEqual(list(columns), ['not_started', 'in_progress', 'completed', 'pending'])
+        self.assertEqual({key: column['count'] for key, column in columns.items()}, {'not_started': 3, 'in_progress': 1, 'completed': 1, 'pending': 1})
+        self.assertEqual([item['id'] for item in columns['not_started']['results']], [task.id for task in self.todo[:2]])
+        self.assertEqual([item['id'] for item in columns['pending']['results']], [self.pending.id])
+        self.assertEqual([column['next'] for key, column in columns.items() if key != 'not_started'], [None, None, None])
+
+        response = self.client.get(columns['not_started']['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'not_started')
+        self.assertEqual((response.data['count'], response.data['next']), (3, None))
+        self.assertEqual([item['id'] for item in response.data['results']], [self.todo[2].id])
+
+    def test_invalid_paging(self):
+        for params in ({'page_size': 0}, {'page_size': 'all'}, {'column': 'not_started', 'after': 'x'}):
+            self.assertEqual(self.client.get(self.path, params).status_code, 400, params)
+
+    def test_assignees(self):
+        self.assertEqual(self.client.get(self.path).data['assignees'], [
+            {'user': self.organizer.id, 'username': 'ann', 'open': 3, 'in_progress': 0, 'completed': 1},
+            {'user': self.participant.id, 'username': 'bob', 'open': 1, 'in_progress': 1, 'completed': 0},
+        ])
+
+    def test_move(self):
+        response = self.move([{'id': self.todo[0].id, 'status': 'in_progress'}, {'id': self.doing.id, 'status': 'in_progress'}])
+        self.assertEqual((response.status_code, response.data), (200, {'updated': 1}))
+        self.assertEqual(Task.objects.get(pk=self.todo[0].pk).status, 'in_progress')
+
+        # The last move of a card wins.
+        response = self.move([{'id': self.done.id, 'status': 'in_progress'}, {'id': self.done.id, 'status': 'not_started'}])
+        self.assertEqual(response.data, {'updated': 1})
+        self.assertEqual(Task.objects.get(pk=self.done.pk).status, 'not_started')
+
+    def test_move_validation(self):
+        for moves in ([], 'all', [{'status': 'completed'}], [{'id': self.todo[0].id, 'status': 'pending'}], [{'id': self.todo[0].id}]):
+            self.assertEqual(self.move(moves).status_code, 400, moves)
+
+        response = self.move([{'id': self.todo[0].id, 'status': 'completed'}, {'id': self.elsewhere.id, 'status': 'completed'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get(pk=self.todo[0].pk).status, 'not_started')
+        self.assertEqual(Task.objects.get(pk=self.elsewhere.pk).status, 'not_started')
+
+        with self.settings(TASK_BOARD_MOVE_MAX=1):
+            moves = [{'id': task.id, 'status': 'completed'} for task in self.todo[:2]]
+            self.assertEqual(self.move(moves).status_code, 400)
+
+    def test_participants_read_but_cannot_move(self):
+        self.client.force_authenticate(self.participant)
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+        self.assertEqual(self.move([{'id': self.todo[0].id, 'status': 'completed'}]).status_code, 403)
+        self.assertEqual(Task.objects.get(pk=self.todo[0].pk).status, 'not_started')
+
+        self.client.force_authenticate(User.objects.create_user('outsider', 'outsider@example.com', 'password'))
+        self.assertEqual(self.client.get(self.path).status_code, 403)
+
+
+class FastPathTests(TestCase):
+    """
+    The fast list actions must render exactly the bytes the serializers they
+    replace would, rendered with JSONRenderer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('zoë', 'zoe@example.com', 'password', image='user_images/zoë portrait.png')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        cls.event = make_event(
+            'Fête "2030"', price=decimal.Decimal('12.5'), image='event_images/launch.jpg',
+            date=datetime.datetime(2030, 1, 1, 18, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+        )
+        Team.objects.create(user=cls.user, event=cls.event, role='organizer', invitation_status=True)
+        Team.objects.create(user=other, event=cls.event, role='participant')
+        Task.objects.create(title='Tâche', description='Line\nbreak\u2028', status='in_progress', event=cls.event, user=cls.user)
+        Task.objects.create(title='Default', description='', event=cls.event, user=other)
+        Ticket.objects.create(code='A-1', user=cls.user, event=cls.event)
+        Message.objects.create(content='Hello \u2029 "world" \U0001f389', sender=cls.user, event=cls.event, image='message_images/a.gif')
+        Message.objects.create(content='\x00\x1f\\', sender=other, event=cls.event)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def drf_request(self, path):
+        return Request(APIRequestFactory().get(path))
+
+    def assertSameBytes(self, path, serializer_class, queryset):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        data = serializer_class(queryset, many=True, context={'request': self.drf_request(path)}).data
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_event_tasks(self):
+        path = '/api/events/%d/tasks/' % self.event.id
+        self.assertSameBytes(path, TaskSerializer, Task.objects.filter(event=self.event))
+
+    def test_event_teams(self):
+        path = '/api/events/%d/teams/' % self.event.id
+        self.assertSameBytes(path, TeamSerializer, Team.objects.filter(event=self.event))
+
+    def test_user_tickets(self):
+        path = '/api/users/%d/tickets/' % self.user.id
+        self.assertSameBytes(path, TicketSerializer, Ticket.objects.filter(user=self.user))
+
+    def test_event_messages(self):
+        path = '/api/events/%d/messages/' % self.event.id
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+        request = self.drf_request(path)
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(Message.objects.filter(event=self.event), request)
+        data = MessageSerializer(page, many=True, context={'request': request}).data
+        self.assertEqual(response.content, JSONRenderer().render(paginator.get_paginated_response(data).data))
+
+    def test_renderer(self):
+        data = {
+            'text': ''.join(chr(i) for i in range(128)) + 'é\u2028\u2029\U0001f389',
+            'numbers': [0, -1, 2 ** 40, True, False, None],
+            'nested': [{'a': {}}, []],
+            1: 'int key',
+            'decimal': decimal.Decimal('12.5'),
+            'datetime': datetime.datetime(2030, 1, 1, 0, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            'lazy': gettext_lazy('lazy'),
+            'error': ErrorDetail('Invalid', code='invalid'),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class BulkInviteTests(TestCase):
+    """POST /api/teams/bulk/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.participant = User.objects.create_user('participant', 'participant@example.com', 'password')
+        cls.guests = [User.objects.create_user('guest%d' % index, '', 'password') for index in range(2)]
+        cls.event = make_event()
+        Team.objects.create(user=cls.organizer, event=cls.event, role='organizer', invitation_status=True)
+        Team.objects.create(user=cls.participant, event=cls.event, role='participant', invitation_status=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def invite(self, usernames, **data):
+        return self.client.post('/api/teams/bulk/', dict({'event': self.event.id, 'usernames': usernames}, **data), format='json')
+
+    def test_results_per_username(self):
+        response = self.invite(['guest0', 'nobody', 'participant', 'guest1', 'guest0'], role='organizer')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(result['username'], result['status']) for result in response.data],
+            [('guest0', 'invited'), ('nobody', 'not_found'), ('participant', 'already_member'), ('guest1', 'invited')],
+        )
+        self.assertEqual(response.data[0]['team']['user'], self.guests[0].id)
+
+        invited = Team.objects.filter(event=self.event, user__in=self.guests)
+        self.assertEqual(set(invited.values_list('role', 'invitation_status')), {('organizer', False)})
+        self.assertEqual(invited.count(), 2)
+
+        # Nothing new to create.
+        response = self.invite(['guest0', 'nobody'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data], ['already_member', 'not_found'])
+
+    def test_validation(self):
+        with self.settings(TEAM_BULK_MAX=2):
+            self.assertEqual(self.invite(['guest0', 'guest1', 'nobody']).status_code, 400)
+        self.assertEqual(self.invite([]).status_code, 400)
+        self.assertEqual(self.invite('guest0').status_code, 400)
+        self.assertEqual(self.invite(['guest0'], role='admin').status_code, 400)
+        self.assertEqual(self.invite(['guest0'], event=0).status_code, 400)
+        self.assertEqual(self.client.post('/api/teams/bulk/', {'usernames': ['guest0']}, format='json').status_code, 400)
+        self.assertFalse(Team.objects.filter(user__in=self.guests).exists())
+
+    def test_organizers_only(self):
+        self.client.force_authenticate(self.participant)
+        self.assertEqual(self.invite(['guest0']).status_code, 403)
+        self.assertFalse(Team.objects.filter(user__in=self.guests).exists())
+
+
+class BulkIssueTests(TestCase):
+    """POST /api/tickets/bulk/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.participant = User.objects.create_user('participant', 'participant@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.organizer, event=cls.event, role='organizer', invitation_status=True)
+        Team.objects.create(user=cls.participant, event=cls.event, role='participant', invitation_status=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def issue(self, data, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post('/api/tickets/bulk/', data, format='json', headers=headers)
+
+    def test_issue_to_holders(self):
+        response = self.issue({'event': self.event.id, 'holders': [self.participant.id, self.organizer.id]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([ticket['user'] for ticket in response.data], [self.participant.id, self.organizer.id])
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 2)
+
+    def test_replay_returns_the_same_tickets(self):
+        data = {'event': self.event.id, 'count': 3}
+        first = self.issue(data, key='order-1')
+        self.assertEqual(first.status_code, 201)
+
+        replay = self.issue(data, key='order-1')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual([ticket['id'] for ticket in replay.data], [ticket['id'] for ticket in first.data])
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 3)
+
+    def test_key_reused_for_another_request(self):
+        self.issue({'event': self.event.id, 'count': 1}, key='order-1')
+        response = self.issue({'event': self.event.id, 'count': 2}, key='order-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 1)
+
+    def test_cap(self):
+        with self.settings(TICKET_BULK_MAX=2):
+            self.assertEqual(self.issue({'event': self.event.id, 'count': 3}).status_code, 400)
+            self.assertEqual(self.issue({'event': self.event.id, 'holders': [self.organizer.id] * 3}).status_code, 400)
+            self.assertEqual(self.issue({'event': self.event.id, 'count': 2}).status_code, 201)
+        self.assertEqual(self.issue({'event': self.event.id, 'count': 10 ** 9}).status_code, 400)
+        self.assertEqual(self.issue({'event': self.event.id, 'count': 0}).status_code, 400)
+
+    def test_holders_must_be_a_list(self):
+        response = self.issue({'event': self.event.id, 'holders': '12'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_only_organizers_issue_to_others(self):
+        self.client.force_authenticate(self.participant)
+        response = self.issue({'event': self.event.id, 'holders': [self.organizer.id]})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.issue({'event': self.event.id, 'holders': [self.participant.id]}).status_code, 201)
+
+    def test_codes_are_unique(self):
+        Ticket.objects.create(code='A-1', user=self.organizer, event=self.event)
+        with self.assertRaises(IntegrityError):
+            Ticket.objects.create(code='A-1', user=self.participant, event=self.event)
+
+
+class TicketCodeMigrationTests(TransactionTestCase):
+    """0013 makes Ticket.code unique on databases that already hold duplicates."""
+
+    before = [('coeventplannerapp', '0012_archivedmessage')]
+    after = [('coeventplannerapp', '0013_ticket_code_unique')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_codes_are_regenerated(self):
+        old_apps = self.migrate(self.before)
+        user = old_apps.get_model('coeventplannerapp', 'User').objects.create(username='holder')
+        event = old_apps.get_model('coeventplannerapp', 'Event').objects.create(
+            title='Launch', description='', price=10, location='Cairo',
+            date=datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+        OldTicket = old_apps.get_model('coeventplannerapp', 'Ticket')
+        first, second, third, other = [
+            OldTicket.objects.create(code=code, user=user, event=event) for code in ('A-1', 'A-1', 'A-1', 'B-1')
+        ]
+
+        new_apps = self.migrate(self.after)
+        codes = dict(new_apps.get_model('coeventplannerapp', 'Ticket').objects.values_list('id', 'code'))
+        self.assertEqual((codes[first.id], codes[other.id]), ('A-1', 'B-1'))
+        self.assertEqual(len(set(codes.values())), 4)
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= and ?expand= on the GET endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sparse', 'sparse@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.user, event=cls.event, role='organizer', invitation_status=True)
+        cls.task = Task.objects.create(title='Venue', description='', status='in_progress', event=cls.event, user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = '/api/events/%d/tasks/' % self.event.id
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_fields(self):
+        self.assertEqual(self.get(self.path, fields='id,status'), [{'id': self.task.id, 'status': 'in_progress'}])
+
+    def test_expand(self):
+        self.assertEqual(
+            self.get(self.path, fields='id', expand='user'),
+            [{'id': self.task.id, 'username': 'sparse', 'image': None, 'image_variants': None}],
+        )
+
+    def test_retrieve(self):
+        self.assertEqual(self.get('/api/tasks/%d/' % self.task.id, fields='title'), {'title': 'Venue'})
+
+    def test_budget_summary(self):
+        path = '/api/events/%d/budget/summary/' % self.event.id
+        self.assertEqual(self.get(path, fields='total,item_count'), {'total': '0.00', 'item_count': 0})
+        self.assertEqual(set(self.get(path, fields='total', expand='event')), {'total', 'ticket_price', 'ticket_revenue', 'balance'})
+
+    def test_unknown_names_are_ignored(self):
+        self.assertEqual(self.get(self.path, fields='id,zzz', expand='zzz'), [{'id': self.task.id}])
+        self.assertEqual(self.get(self.path, fields='zzz'), self.get(self.path))
+
+    def test_unknown_names_do_not_grow_the_mapper_cache(self):
+        self.get(self.path, fields='id')
+        size = fastpath.mapper_for.cache_info().currsize
+        for index in range(20):
+            self.get(self.path, fields='id,junk%d' % index)
+        self.assertEqual(fastpath.mapper_for.cache_info().currsize, size)
+
+    def test_export_with_unknown_names(self):
+        response = self.client.get('/api/events/%d/tasks/export/' % self.event.id, {'fields': 'zzz', 'export_format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, self.get(self.path))
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    PrimaryReplicaRouter against two SQLite databases: the test database as
+    the primary and a file refreshed from it by sync_replica.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        replica = dict(connections['default'].settings_dict, NAME=os.path.join(directory, 'replica.sqlite3'))
+
+        connections.settings['replica'] = replica
+        # Connected up front: TransactionTestCase refuses to open connections
+        # to aliases that were not configured when the class was set up.
+        connections['replica'].connect()
+        self.addCleanup(self.drop_replica_connection)
+
+        self.scope = routers.start_request()
+        self.addCleanup(lambda: routers.finish_request(self.scope))
+
+    def drop_replica_connection(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def new_request(self):
+        routers.finish_request(self.scope)
+        self.scope = routers.start_request()
+
+    def create_event(self, title):
+        return make_event(title)
+
+    def test_reads_go_to_the_synced_replica(self):
+        self.create_event('Synced')
+        call_command('sync_replica', stdout=io.StringIO())
+        self.create_event('Not synced yet')
+
+        self.new_request()
+        queryset = Event.objects.order_by('id')
+        self.assertEqual(queryset.db, 'replica')
+        self.assertEqual([event.title for event in queryset], ['Synced'])
+
+    def test_writes_pin_the_request_to_the_primary(self):
+        call_command('sync_replica', stdout=io.StringIO())
+        self.new_request()
+        self.assertEqual(Event.objects.all().db, 'replica')
+
+        event = self.create_event('Launch')
+        self.assertTrue(routers.is_pinned())
+        self.assertEqual(Event.objects.all().db, 'default')
+        self.assertEqual(Event.objects.get(pk=event.pk).title, 'Launch')
+
+        self.new_request()
+        self.assertEqual(Event.objects.all().db, 'replica')
+
+    def test_cached_lookups_read_the_primary(self):
+        call_command('sync_replica', stdout=io.StringIO())
+        user = User.objects.create_user('member', 'member@example.com', 'password')
+        event = self.create_event('Launch')
+        Team.objects.create(user=user, event=event, role='organizer', invitation_status=True)
+        self.new_request()
+
+        membership.clear()
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user
+        self.assertTrue(membership.is_organizer(request, event.id))
+
+        authentication.clear()
+        token = AccessToken.for_user(user)
+        self.assertEqual(CachedJWTAuthentication().get_user(token).pk, user.pk)
+
+    def test_cached_and_tagged_responses_read_the_primary(self):
+        user = User.objects.create_user('member', 'member@example.com', 'password')
+        event = self.create_event('Launch')
+        Team.objects.create(user=user, event=event, role='organizer', invitation_status=True)
+        call_command('sync_replica', stdout=io.StringIO())
+        cache.clear()
+        membership.clear()
+
+        # Written after the snapshot, read before the next one.
+        event.title = 'Renamed'
+        event.save()
+        task = Task.objects.create(title='Venue', description='', event=event, user=user)
+        self.new_request()
+        self.assertEqual(Event.objects.get(pk=event.pk).title, 'Launch')
+
+        client = APIClient()
+        tag = versions.etag(event.id)
+        response = client.get('/api/events/%d/' % event.id)
+        self.assertEqual((response.data['title'], response['ETag']), ('Renamed', tag))
+        self.assertEqual(client.get('/api/events/').data['results'][0]['title'], 'Renamed')
+
+        client.force_authenticate(user)
+        response = client.get('/api/events/%d/tasks/' % event.id)
+        self.assertEqual(([item['id'] for item in response.data], response['ETag']), ([task.id], tag))
+
+    def test_stream_backlog_reads_the_primary(self):
+        user = User.objects.create_user('member', 'member@example.com', 'password')
+        event = self.create_event('Launch')
+        call_command('sync_replica', stdout=io.StringIO())
+        message = Message.objects.create(content='Hello', sender=user, event=event)
+        self.new_request()
+
+        backlog = views._stream_backlog(APIRequestFactory().get('/'), event.id, 0)
+        self.assertEqual([message_id for message_id, data in backlog], [message.id])
+
+    def test_no_migrations_on_the_replica(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'coeventplannerapp'))
+        self.assertIsNone(router.allow_migrate('default', 'coeventplannerapp'))
+
+
+class AsyncReadViewTests(TestCase):
+    """The ASYNC_READ_VIEWS routes answer exactly as the viewset routes do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.member, event=cls.event, role='organizer', invitation_status=True)
+        Task.objects.create(title='Venue', description='', event=cls.event, user=cls.member)
+        Message.objects.create(content='Hello', sender=cls.member, event=cls.event)
+
+    def tearDown(self):
+        reload_urls()
+
+    def responses(self, async_views):
+        with self.settings(ASYNC_READ_VIEWS=async_views):
+            reload_urls()
+            cache.clear()
+            client = AsyncClient()
+            paths = ['/api/events/%d/%s' % (self.event.id, suffix) for suffix in ('tasks/', 'teams/', 'messages/', '')]
+            paths += ['/api/events/%d/messages/?before=garbage' % self.event.id, '/api/me/events/', '/api/events/0/']
+
+            seen = []
+            for path in paths:
+                for user in (self.member, self.outsider, None):
+                    headers = {'Authorization': 'Bearer %s' % AccessToken.for_user(user)} if user else {}
+                    response = async_to_sync(client.get)(path, headers=headers)
+                    seen.append((path, response.status_code, dict(response.headers), response.content))
+                    if 'ETag' in response:
+                        headers['If-None-Match'] = response['ETag']
+                        response = async_to_sync(client.get)(path, headers=headers)
+                        seen.append((path, response.status_code, dict(response.headers), response.content))
+            return seen
+
+    def test_same_status_headers_and_body(self):
+        sync_responses = self.responses(False)
+        async_responses = self.responses(True)
+
+        self.assertEqual(len(sync_responses), len(async_responses))
+        for expected, actual in zip(sync_responses, async_responses):
+            self.assertEqual(expected, actual)
+        self.assertEqual(
+            {(path, code) for path, code, _, _ in async_responses if code != 200},
+            {
+                ('/api/events/%d/%s' % (self.event.id, suffix), code)
+                for suffix in ('tasks/', 'teams/', 'messages/') for code in (304, 403, 401)
+            } | {
+                ('/api/events/%d/messages/?before=garbage' % self.event.id, code) for code in (400, 403, 401)
+            } | {('/api/events/%d/' % self.event.id, 304), ('/api/me/events/', 401), ('/api/events/0/', 404)},
+        )
+
+
+class MessageBrokerTests(TestCase):
+
+    async def test_publish_reaches_subscribers_of_the_event(self):
+        broker = MessageBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        broker.publish(1, 7, {'id': 7})
+        self.assertEqual(await asyncio.wait_for(subscription.queue.get(), 1), (7, {'id': 7}))
+        self.assertTrue(other.queue.empty())
+
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other)
+        self.assertEqual(broker.subscriber_count(1), 0)
+
+    async def test_overflow_closes_the_subscription(self):
+        broker = MessageBroker()
+        with self.settings(MESSAGE_STREAM_QUEUE_SIZE=2):
+            subscription = broker.subscribe(1)
+        for message_id in range(3):
+            broker.publish(1, message_id, {})
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(await subscription.queue.get(), (1, {}))
+        self.assertIsNone(await subscription.queue.get())
+
+
+class MessageStreamTests(TestCase):
+    """views._message_stream, the body of GET /api/events/<id>/messages/stream/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+        cls.messages = [Message.objects.create(content='Message %d' % i, sender=cls.user, event=cls.event) for i in range(3)]
+
+    async def read(self, stream, count):
+        return [await asyncio.wait_for(anext(stream), 1) for _ in range(count)]
+
+    def ids(self, pieces):
+        return [int(re.match(r'id: (\d+)\n', piece).group(1)) for piece in pieces]
+
+    async def test_backlog_then_live_messages_without_duplicates(self):
+        first, second, third = [message.id for message in self.messages]
+        stream = views._message_stream(APIRequestFactory().get('/'), self.event.id, first)
+        try:
+            self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+            self.assertEqual(self.ids(await self.read(stream, 2)), [second, third])
+
+            # Already sent from the backlog, then a lower id committed after a higher one.
+            views.broker.publish(self.event.id, third, {})
+            views.broker.publish(self.event.id, third + 2, {})
+            views.broker.publish(self.event.id, third + 1, {})
+            self.assertEqual(self.ids(await self.read(stream, 2)), [third + 2, third + 1])
+        finally:
+            await stream.aclose()
+        self.assertEqual(views.broker.subscriber_count(self.event.id), 0)
+
+    async def test_backlog_is_one_page(self):
+        with patch.object(MessageCursorPagination, 'page_size', 2):
+            stream = views._message_stream(APIRequestFactory().get('/'), self.event.id, 0)
+            try:
+                pieces = await self.read(stream, 3)
+                views.broker.publish(self.event.id, 1000, {})
+                pieces += await self.read(stream, 1)
+            finally:
+                await stream.aclose()
+        self.assertEqual(self.ids(pieces[1:]), [self.messages[1].id, self.messages[2].id, 1000])
+
+
+class ExportTests(TestCase):
+    """Exports stream every row as the list endpoint renders it, for organizers only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.participant = User.objects.create_user('participant', 'participant@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.organizer, event=cls.event, role='organizer', invitation_status=True)
+        Team.objects.create(user=cls.participant, event=cls.event, role='participant', invitation_status=True)
+        cls.titles = ['Venue', '=HYPERLINK("http://example.com")', '+1', '-1', '@SUM(A1)', 'Catering']
+        cls.tasks = [Task.objects.create(title=title, description='', event=cls.event, user=cls.organizer) for title in cls.titles]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def export(self, export_format, name='tasks'):
+        url = '/api/events/%d/%s/export/?export_format=%s' % (self.event.id, name, export_format)
+        with self.settings(EXPORT_CHUNK_SIZE=4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual([int(row['id']) for row in rows], [task.id for task in self.tasks])
+        self.assertEqual(
+            [row['title'] for row in rows],
+            ['Venue', '\'=HYPERLINK("http://example.com")', "'+1", "'-1", "'@SUM(A1)", 'Catering'],
+        )
+
+    def test_csv_numbers_are_not_escaped(self):
+        BudgetItem.objects.create(title='-Refund', description='=1+1', amount=decimal.Decimal('-20'), event=self.event)
+        row, = csv.DictReader(io.StringIO(self.export('csv', 'budgetitems')))
+        self.assertEqual((row['title'], row['description'], row['amount']), ("'-Refund", "'=1+1", '-20.00'))
+
+    def test_jsonl(self):
+        items = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertEqual([item['title'] for item in items], self.titles)
+        listed = self.client.get('/api/events/%d/tasks/' % self.event.id).data
+        self.assertEqual(items, json.loads(JSONRenderer().render(listed)))
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/events/%d/tasks/export/?export_format=xlsx' % self.event.id)
+        self.assertEqual(response.status_code, 400)
+
+    def test_organizers_only(self):
+        self.client.force_authenticate(self.participant)
+        for name in ('tasks', 'teams', 'budgetitems', 'tickets'):
+            response = self.client.get('/api/events/%d/%s/export/' % (self.event.id, name))
+            self.assertEqual(response.status_code, 403, name)
+
+
+class ReadCursorTests(TestCase):
+    """Unread counts per event and read cursors that only move forward."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        cls.other = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.events = [make_event('First'), make_event('Second')]
+        for event in cls.events:
+            Team.objects.create(user=cls.user, event=event, role='participant', invitation_status=True)
+            Team.objects.create(user=cls.other, event=event, role='participant', invitation_status=True)
+        cls.messages = [Message.objects.create(content='Message %d' % i, sender=cls.other, event=cls.events[0]) for i in range(3)]
+        Message.objects.create(content='Mine', sender=cls.user, event=cls.events[0])
+        Message.objects.create(content='Elsewhere', sender=cls.other, event=cls.events[1])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.event = self.events[0]
+
+    def mark_read(self, message=None):
+        data = {} if message is None else {'message': message.id}
+        response = self.client.post('/api/events/%d/messages/read/' % self.event.id, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['unread']
+
+    def cursor(self):
+        return MessageReadCursor.objects.get(user=self.user, event=self.event).last_read_id
+
+    def test_unread_counts_per_event(self):
+        first, second = self.events
+        response = self.client.get('/api/me/messages/unread/')
+        self.assertEqual(response.data, [{'event': first.id, 'unread': 3}, {'event': second.id, 'unread': 1}])
+
+        self.assertEqual(self.mark_read(self.messages[1]), 1)
+        response = self.client.get('/api/me/messages/unread/')
+        self.assertEqual(response.data, [{'event': first.id, 'unread': 1}, {'event': second.id, 'unread': 1}])
+
+    def test_cursor_never_moves_back(self):
+        self.assertEqual(self.mark_read(self.messages[2]), 0)
+        self.assertEqual(self.mark_read(self.messages[0]), 0)
+        self.assertEqual(self.cursor(), self.messages[2].id)
+
+    def test_mark_newest(self):
+        self.assertEqual(self.mark_read(), 0)
+        self.assertEqual(self.cursor(), Message.objects.filter(event=self.event).latest('created_at', 'id').id)
+
+    def test_concurrent_first_read(self):
+        exists = QuerySet.exists
+
+        def lose_the_race(queryset):
+            if queryset.model is not MessageReadCursor:
+                return exists(queryset)
+            # A concurrent first read for an earlier message inserts right after the check.
+            MessageReadCursor.objects.create(
+                user=self.user, event=self.event, last_read_at=self.messages[0].created_at, last_read_id=self.messages[0].id,
+            )
+            return False
+
+        with patch.object(QuerySet, 'exists', autospec=True, side_effect=lose_the_race):
+            self.assertEqual(self.mark_read(self.messages[1]), 1)
+        self.assertEqual(self.cursor(), self.messages[1].id)
+
+    def test_members_only(self):
+        self.client.force_authenticate(User.objects.create_user('outsider', 'outsider@example.com', 'password'))
+        response = self.client.post('/api/events/%d/messages/read/' % self.event.id, {}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pages of an event's messages, newest page first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.user, event=cls.event, role='participant', invitation_status=True)
+        cls.ids = [Message.objects.create(content='Message %d' % i, sender=cls.user, event=cls.event).id for i in range(7)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = '/api/events/%d/messages/' % self.event.id
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']], response.data['previous'], response.data['next']
+
+    def test_before_and_after_links(self):
+        ids, previous, next_url = self.page(self.path, {'page_size': 3})
+        self.assertEqual((ids, next_url), (self.ids[4:], None))
+
+        ids, previous, next_url = self.page(previous)
+        self.assertEqual(ids, self.ids[1:4])
+        self.assertEqual(self.page(next_url)[0], self.ids[4:])
+
+        ids, previous, next_url = self.page(previous)
+        self.assertEqual((ids, previous), (self.ids[:1], None))
+        self.assertEqual(self.page(next_url)[0], self.ids[1:4])
+
+    def test_page_size(self):
+        self.assertEqual(self.page(self.path, {'page_size': 0})[0], self.ids)
+        with patch.object(MessageCursorPagination, 'max_page_size', 2):
+            self.assertEqual(self.page(self.path, {'page_size': 50})[0], self.ids[5:])
+
+    def test_invalid_cursors(self):
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        for param in ('before', 'after'):
+            for value in ('garbage', encode('2030-01-01T00:00:00+00:00'), encode('not a date|1'), encode('2030-01-01|x'), 'é'):
+                response = self.client.get(self.path, {param: value})
+                self.assertEqual(response.status_code, 400, (param, value))
+                self.assertEqual(response.data, {param: 'Invalid cursor'})
+
+
+class MessageSearchTests(TestCase):
+    """Ranked, highlighted and paged search within one event's messages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+        other = make_event('Other')
+        Team.objects.create(user=cls.user, event=cls.event, role='participant', invitation_status=True)
+
+        def message(content, event=cls.event):
+            return Message.objects.create(content=content, sender=cls.user, event=event)
+        cls.once = message('Budget review tomorrow')
+        cls.thrice = message('Budget, budget and budget again')
+        cls.markup = message('Lunch <b>menu</b> & drinks')
+        for index in range(5):
+            message('Hello %d' % index)
+        message('Budget elsewhere', other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = '/api/events/%d/messages/search/' % self.event.id
+
+    def search(self, **params):
+        response = self.client.get(self.path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_within_the_event(self):
+        data = self.search(q='budget')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([item['id'] for item in data['results']], [self.thrice.id, self.once.id])
+        # Prefixes and stems match too.
+        self.assertEqual([item['id'] for item in self.search(q='budg')['results']], [self.thrice.id, self.once.id])
+        self.assertEqual([item['id'] for item in self.search(q='reviewing')['results']], [self.once.id])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        item, = self.search(q='menu')['results']
+        self.assertEqual(item['snippet'], 'Lunch &lt;b&gt;<mark>menu</mark>&lt;/b&gt; &amp; drinks')
+
+    def test_pages(self):
+        data = self.search(q='budget', page_size=1)
+        self.assertEqual(([item['id'] for item in data['results']], data['count']), ([self.thrice.id], 2))
+        data = self.client.get(data['next']).data
+        self.assertEqual([item['id'] for item in data['results']], [self.once.id])
+        self.assertIsNone(data['next'])
+
+    def test_no_query(self):
+        for q in ('', '"*()'):
+            self.assertEqual(self.search(q=q)['count'], 0)
+
+    def test_members_only(self):
+        self.client.force_authenticate(User.objects.create_user('outsider', 'outsider@example.com', 'password'))
+        self.assertEqual(self.client.get(self.path, {'q': 'budget'}).status_code, 403)
+
+
+class MessageArchiveTests(TestCase):
+    """Archived messages keep their place in the history and can be marked read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+        Team.objects.create(user=cls.user, event=cls.event, role='participant', invitation_status=True)
+        start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        cls.ids = []
+        for i in range(5):
+            message = Message.objects.create(content='Agenda %d' % i, sender=cls.user, event=cls.event)
+            Message.objects.filter(pk=message.pk).update(created_at=start + datetime.timedelta(days=i))
+            cls.ids.append(message.id)
+        cls.moved = archive.archive_messages(before=start + datetime.timedelta(days=3), event_ids=[cls.event.id])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archived(self):
+        self.assertEqual(self.moved, 3)
+        self.assertEqual(list(ArchivedMessage.objects.order_by('id').values_list('id', flat=True)), self.ids[:3])
+        self.assertEqual(list(Message.objects.order_by('id').values_list('id', flat=True)), self.ids[3:])
+
+    def test_pages_read_through_to_archive(self):
+        url = '/api/events/%d/messages/?page_size=2' % self.event.id
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.data['results']])
+            url = response.data['previous']
+        self.assertEqual(pages, [self.ids[3:5], self.ids[1:3], self.ids[:1]])
+
+        url = '/api/events/%d/messages/?page_size=2&after=%s' % (
+            self.event.id, MessageCursorPagination().encode_cursor(ArchivedMessage.objects.get(pk=self.ids[1])),
+        )
+        self.assertEqual([item['id'] for item in self.client.get(url).data['results']], self.ids[2:4])
+
+    def test_mark_read_archived_message(self):
+        response = self.client.post('/api/events/%d/messages/read/' % self.event.id, {'message': self.ids[1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MessageReadCursor.objects.get(user=self.user, event=self.event).last_read_id, self.ids[1])
+
+        response = self.client.post('/api/events/%d/messages/read/' % self.event.id, {'message': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_read_newest_when_all_archived(self):
+        archive.archive_messages(before=datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc), event_ids=[self.event.id])
+        response = self.client.post('/api/events/%d/messages/read/' % self.event.id, {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MessageReadCursor.objects.get(user=self.user, event=self.event).last_read_id, self.ids[-1])
+
+    def test_search_skips_archive(self):
+        response = self.client.get('/api/events/%d/messages/search/?q=agenda' % self.event.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item['id'] for item in response.data['results']), self.ids[3:])
+
+
+class BudgetRollupTests(TestCase):
+    """EventBudget stays equal to Sum/Count over the event's items and tickets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.events = [
+            make_event(title)
+            for title in ('Launch', 'Party')
+        ]
+
+    def assertRollupsMatch(self):
+        for event in self.events:
+            items = BudgetItem.objects.filter(event=event).aggregate(total=Sum('amount'), item_count=Count('id'))
+            rollup = EventBudget.objects.get(event=event)
+            self.assertEqual(
+                (rollup.total, rollup.item_count, rollup.ticket_count),
+                (items['total'] or 0, items['item_count'], Ticket.objects.filter(event=event).count()),
+            )
+
+    def test_budget_item_writes(self):
+        launch, party = self.events
+        item = BudgetItem.objects.create(title='Venue', description='', amount=decimal.Decimal('100.50'), event=launch)
+        BudgetItem.objects.create(title='Food', description='', amount=decimal.Decimal('20'), event=launch)
+        self.assertRollupsMatch()
+
+        item.amount = decimal.Decimal('75')
+        item.save()
+        self.assertRollupsMatch()
+
+        item.event = party
+        item.save()
+        self.assertRollupsMatch()
+
+        item.delete()
+        self.assertRollupsMatch()
+
+    def test_ticket_writes(self):
+        launch, party = self.events
+        ticket = Ticket.objects.create(code='a', user=self.user, event=launch)
+        Ticket.objects.create(code='b', user=self.user, event=launch)
+        self.assertRollupsMatch()
+
+        ticket.event = party
+        ticket.save()
+        self.assertRollupsMatch()
+
+        ticket.delete()
+        self.assertRollupsMatch()
+
+    def test_bulk_issue(self):
+        Team.objects.create(user=self.user, event=self.events[0], role='organizer', invitation_status=True)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/tickets/bulk/', {'event': self.events[0].id, 'count': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertRollupsMatch()
+
+    def test_rebuild_replaces_existing_rollups(self):
+        BudgetItem.objects.create(title='Venue', description='', amount=decimal.Decimal('100'), event=self.events[0])
+        EventBudget.objects.filter(event=self.events[0]).update(total=1, item_count=9)
+        EventBudget.objects.filter(event=self.events[1]).delete()
+
+        self.assertEqual(budget.rebuild(), 2)
+        self.assertEqual(budget.rebuild([self.events[0].id]), 1)
+        self.assertRollupsMatch()
+
+    def test_backfill_migration(self):
+        BudgetItem.objects.create(title='Venue', description='', amount=decimal.Decimal('100'), event=self.events[0])
+        Ticket.objects.create(code='a', user=self.user, event=self.events[0])
+        EventBudget.objects.all().delete()
+
+        backfill = importlib.import_module('coeventplannerapp.migrations.0014_backfill_event_budgets')
+        backfill.backfill_event_budgets(apps, None)
+        self.assertRollupsMatch()
+
+
+class CachedUserTests(TestCase):
+    """Changes to a user apply on the next request despite the JWT user cache."""
+
+    def setUp(self):
+        authentication.clear()
+        self.user = User.objects.create_user('member', 'member@example.com', 'password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+        self.assertEqual(self.client.get('/api/me/events/').status_code, 200)
+
+    def assertRejected(self, code):
+        response = self.client.get('/api/me/events/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['detail'].code, code)
+
+    def test_deactivate_with_save(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected('user_inactive')
+
+    def test_deactivate_with_queryset_update(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertRejected('user_inactive')
+
+    def test_deactivate_with_bulk_update(self):
+        self.user.is_active = False
+        User.objects.bulk_update([self.user], ['is_active'])
+        self.assertRejected('user_inactive')
+
+    def test_delete(self):
+        self.user.delete()
+        self.assertRejected('user_not_found')
+
+    def test_queryset_delete(self):
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertRejected('user_not_found')
+
+
+class CatalogueTests(TestCase):
+    """The public event list: date order, pages, filters and full-text search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.night = make_event('Jazz night', description='Live music', date=utc(2030, 1, 1))
+        cls.fair = make_event('Book fair', description='Jazz records on sale', location='Alexandria', price=0, date=utc(2030, 2, 1))
+        cls.festival = make_event('Jazz festival', description='Jazz bands', price=50, date=utc(2030, 3, 1, 12))
+        cls.marathon = make_event('Marathon', location='Giza', price=25, date=utc(2030, 3, 1, 23))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def ids(self, **params):
+        response = self.client.get('/api/events/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_date_order_and_pages(self):
+        response = self.client.get('/api/events/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.night.id, self.fair.id])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.festival.id, self.marathon.id])
+        self.assertIsNone(response.data['next'])
+
+    def test_page_size_is_capped(self):
+        with patch.object(EventPagination, 'max_page_size', 3):
+            self.assertEqual(len(self.ids(page_size=100)), 3)
+
+    def test_filters(self):
+        self.assertEqual(self.ids(location='Cairo'), [self.night.id, self.festival.id])
+        self.assertEqual(self.ids(min_price='10', max_price='25'), [self.night.id, self.marathon.id])
+        self.assertEqual(self.ids(date_after='2030-02-01'), [self.fair.id, self.festival.id, self.marathon.id])
+        self.assertEqual(self.ids(date_after='2030-03-01T18:00:00Z'), [self.marathon.id])
+        # A bare date_before covers the whole day.
+        self.assertEqual(self.ids(date_after='2030-02-15', date_before='2030-03-01'), [self.festival.id, self.marathon.id])
+
+    def test_invalid_filters(self):
+        for param, value in [('date_after', 'soon'), ('date_before', '2030-13-01'), ('min_price', 'cheap'), ('max_price', '1,5')]:
+            response = self.client.get('/api/events/', {param: value})
+            self.assertEqual(response.status_code, 400, param)
+            self.assertIn(param, response.data)
+
+    def test_search_ranks_title_matches_first(self):
+        for text in ('jazz', 'JAZ'):
+            ids = self.ids(search=text)
+            self.assertEqual(set(ids[:2]), {self.festival.id, self.night.id})
+            self.assertEqual(ids[2:], [self.fair.id])
+        self.assertEqual(set(self.ids(search='jazz', location='Cairo')), {self.festival.id, self.night.id})
+        self.assertEqual(self.ids(search='jazz marathon'), [])
+        self.assertEqual(self.ids(search='"*'), [])
+
+    def test_search_follows_updates_and_deletes(self):
+        self.marathon.title = 'Jazz run'
+        self.marathon.save()
+        self.night.delete()
+        ids = self.ids(search='jazz')
+        self.assertEqual((set(ids[:2]), ids[2:]), ({self.festival.id, self.marathon.id}, [self.fair.id]))
+        self.assertEqual(self.ids(search='marathon'), [])
+
+
+class EventVersionTests(TestCase):
+    """Event ETags, 304s and the version bumps behind them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        cls.participant = User.objects.create_user('participant', 'participant@example.com', 'password')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'password')
+        cls.event, cls.other_event = [
+            make_event(title)
+            for title in ('Launch', 'Party')
+        ]
+        Team.objects.create(user=cls.organizer, event=cls.event, role='organizer', invitation_status=True)
+        cls.task = Task.objects.create(title='Venue', description='', event=cls.event, user=cls.organizer)
+
+    def setUp(self):
+        membership.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def version(self, event):
+        return EventVersion.objects.get(event=event).version
+
+    def assertBumps(self, write, *events):
+        events = events or (self.event,)
+        before = [self.version(event) for event in events]
+        write()
+        self.assertEqual([self.version(event) for event in events], [version + 1 for version in before])
+
+    def test_not_modified(self):
+        path = '/api/events/%d/tasks/' % self.event.id
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        tag = response['ETag']
+        self.assertEqual(tag, '"%d.%d"' % (self.event.id, self.version(self.event)))
+
+        response = self.client.get(path, headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], tag)
+
+        Task.objects.create(title='Catering', description='', event=self.event, user=self.organizer)
+        response = self.client.get(path, headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], tag)
+
+    def test_event_detail_is_tagged_for_anyone(self):
+        path = '/api/events/%d/' % self.event.id
+        tag = self.client.get(path)['ETag']
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(path, headers={'If-None-Match': tag}).status_code, 304)
+
+    def test_non_member_gets_403_not_304(self):
+        path = '/api/events/%d/tasks/' % self.event.id
+        tag = self.client.get(path)['ETag']
+
+        self.client.force_authenticate(self.outsider)
+        response = self.client.get(path, headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+
+    def test_model_writes_bump(self):
+        self.assertBumps(lambda: self.event.save())
+        self.assertBumps(lambda: Task.objects.create(title='Catering', description='', event=self.event, user=self.organizer))
+        team = Team(user=self.participant, event=self.event, role='participant', invitation_status=False)
+        self.assertBumps(team.save)
+        self.assertBumps(lambda: BudgetItem.objects.create(title='Venue', description='', amount=10, event=self.event))
+        self.assertBumps(lambda: Ticket.objects.create(code='a', user=self.participant, event=self.event))
+        self.assertBumps(lambda: Message.objects.create(content='Hello', sender=self.organizer, event=self.event))
+        self.assertBumps(team.delete)
+
+    def test_moving_a_task_bumps_both_events(self):
+        self.task.event = self.other_event
+        self.assertBumps(self.task.save, self.event, self.other_event)
+
+    def test_renaming_a_member_bumps_their_events(self):
+        self.organizer.username = 'host'
+        self.assertBumps(self.organizer.save)
+
+    def assertPostBumps(self, path, data, status_code):
+        before = self.version(self.event)
+        response = self.client.post(path, data, format='json')
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(self.version(self.event), before + 1)
+
+    def test_bulk_invite_bumps(self):
+        self.assertPostBumps('/api/teams/bulk/', {'event': self.event.id, 'usernames': ['participant']}, 201)
+
+    def test_bulk_issue_bumps(self):
+        self.assertPostBumps('/api/tickets/bulk/', {'event': self.event.id, 'count': 2}, 201)
+
+    def test_board_move_bumps(self):
+        move = {'id': self.task.id, 'status': 'completed'}
+        self.assertPostBumps('/api/events/%d/tasks/board/move/' % self.event.id, {'moves': [move]}, 200)
+
+
+class BenchTests(TestCase):
+    """The bench management command's targets and database guard."""
+
+    options = {
+        'users': 20, 'events': 3, 'team_alpha': 1.2, 'max_team_size': 10, 'tasks_per_member': 0.5,
+        'budget_items_per_event': 2, 'tickets_per_member': 1.0, 'messages_per_member': 1.0,
+    }
+
+    def test_every_route_is_benchmarked(self):
+        dataset = bench.seed(self.options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, missing = bench.run(dataset, 1)
+
+        self.assertEqual(missing, [])
+        self.assertEqual(len(results), len(bench.endpoints()) - len(bench.UNBENCHMARKED))
+        self.assertFalse([label for label, result in results.items() if '500' in result['status_codes']])
+
+    def test_unbenchmarked_routes_are_reported(self):
+        dataset = bench.seed(self.options)
+        targets = bench.targets
+        with patch.object(bench, 'targets', lambda dataset: [t for t in targets(dataset) if t[0] != 'event-tickets-export']):
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, missing = bench.run(dataset, 1)
+        self.assertEqual(missing, ['GET event-tickets-export'])
+
+    def test_keep_database_refuses_a_seeded_database(self):
+        User.objects.create_user('member', 'member@example.com', 'password')
+        with self.assertRaises(CommandError):
+            call_command('bench', keep_database=True, stdout=io.StringIO())
+
+
+class ResponseCacheTests(TestCase):
+    """Entries are served until their soft expiry and orphaned by invalidate_event."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return Response({'calls': self.calls})
+
+    def request(self, path='/events/1/'):
+        return Request(APIRequestFactory().get(path))
+
+    def test_miss_then_hit(self):
+        key = responsecache.detail_key(self.request(), 1)
+        first = responsecache.cached_response(key, self.compute)
+        second = responsecache.cached_response(key, self.compute)
+        self.assertEqual((first['X-Cache'], first.data), ('MISS', {'calls': 1}))
+        self.assertEqual((second['X-Cache'], second.data), ('HIT', {'calls': 1}))
+
+    def test_errors_are_not_cached(self):
+        key = responsecache.detail_key(self.request(), 1)
+        responsecache.cached_response(key, lambda: Response(status=404))
+        self.assertEqual(responsecache.cached_response(key, self.compute)['X-Cache'], 'MISS')
+
+    def test_expired_entry_served_stale_while_locked(self):
+        key = responsecache.detail_key(self.request(), 1)
+        responsecache.cached_response(key, self.compute)
+        cache.set(key, (0, {'calls': 1}))
+        cache.add(key + ':lock', 1)
+        response = responsecache.cached_response(key, self.compute)
+        self.assertEqual((response['X-Cache'], response.data), ('STALE', {'calls': 1}))
+        cache.delete(key + ':lock')
+        response = responsecache.cached_response(key, self.compute)
+        self.assertEqual((response['X-Cache'], response.data), ('MISS', {'calls': 2}))
+
+    def test_cold_miss_computes_after_short_wait(self):
+        key = responsecache.detail_key(self.request(), 1)
+        cache.add(key + ':lock', 1)
+        started = time.monotonic()
+        response = responsecache.cached_response(key, self.compute)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual((response['X-Cache'], response.data), ('MISS', {'calls': 1}))
+
+    def test_invalidate_event(self):
+        detail = responsecache.detail_key(self.request(), 1)
+        other = responsecache.detail_key(self.request('/events/2/'), 2)
+        listing = responsecache.list_key(self.request('/events/'))
+        for key in (detail, other, listing):
+            responsecache.cached_response(key, self.compute)
+
+        responsecache.invalidate_event(1)
+        self.assertNotEqual(responsecache.detail_key(self.request(), 1), detail)
+        self.assertNotEqual(responsecache.list_key(self.request('/events/')), listing)
+        self.assertEqual(responsecache.detail_key(self.request('/events/2/'), 2), other)
+        self.assertEqual(responsecache.cached_response(other, self.compute)['X-Cache'], 'HIT')
+
+    def test_evicted_generation_does_not_revive_entries(self):
+        key = responsecache.detail_key(self.request(), 1)
+        responsecache.cached_response(key, self.compute)
+        cache.delete('event-cache:gen:1')
+        self.assertNotEqual(responsecache.detail_key(self.request(), 1), key)
+
+
+class MembershipCacheTests(TestCase):
+    """Cached roles follow Team writes on the next lookup."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.event = make_event()
+
+    def setUp(self):
+        membership.clear()
+
+    def request(self):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.user
+        return request
+
+    def test_role_change(self):
+        team = Team.objects.create(user=self.user, event=self.event, role='participant', invitation_status=True)
+        self.assertEqual(membership.get_role(self.request(), self.event.id), 'participant')
+
+        team.role = 'organizer'
+        team.save()
+        self.assertEqual(membership.get_role(self.request(), self.event.id), 'organizer')
+
+    def test_removal(self):
+        team = Team.objects.create(user=self.user, event=self.event, role='organizer', invitation_status=True)
+        self.assertTrue(membership.is_member(self.request(), self.event.id))
+
+        team.delete()
+        self.assertFalse(membership.is_member(self.request(), self.event.id))
+
+    def test_same_request_sees_its_own_writes(self):
+        request = self.request()
+        self.assertFalse(membership.is_member(request, self.event.id))
+
+        Team.objects.create(user=self.user, event=self.event, role='participant', invitation_status=True)
+        self.assertTrue(membership.is_member(request, self.event.id))
+
+    def test_read_racing_a_change_does_not_cache_the_old_role(self):
+        team = Team.objects.create(user=self.user, event=self.event, role='participant', invitation_status=True)
+        load_role = membership._load_role
+
+        def racing_load(user_id, event_id):
+            role = load_role(user_id, event_id)
+            # The change commits after this read and before its result is cached.
+            team.role = 'organizer'
+            team.save()
+            return role
+
+        with patch.object(membership, '_load_role', racing_load):
+            self.assertEqual(membership.get_role(self.request(), self.event.id), 'participant')
+        self.assertEqual(membership.get_role(self.request(), self.event.id), 'organizer')
+
+    def test_cached_in_the_shared_cache(self):
+        Team.objects.create(user=self.user, event=self.event, role='organizer', invitation_status=True)
+        self.assertTrue(membership.is_organizer(self.request(), self.event.id))
+
+        with patch.object(membership, '_load_role') as load_role:
+            self.assertTrue(membership.is_organizer(self.request(), self.event.id))
+        load_role.assert_not_called()
+
+    def test_survives_culling_of_the_default_cache(self):
+        events = [make_event('Event %d' % index) for index in range(200)]
+        Team.objects.bulk_create([Team(user=self.user, event=event, role='participant', invitation_status=True) for event in events])
+        for event in events:
+            membership.get_role(self.request(), event.id)
+
+        # Well past the default cache's MAX_ENTRIES.
+        cache.set_many({'filler:%d' % index: index for index in range(1000)})
+        with patch.object(membership, '_load_role') as load_role:
+            for event in events:
+                self.assertEqual(membership.get_role(self.request(), event.id), 'participant')
+        load_role.assert_not_called()
+
+
+def png(size=(300, 200), color='red'):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return ContentFile(output.getvalue(), name='photo.png')
+
+
+class ImageVariantTests(TestCase):
+    """Variant names are recorded as saved, linked only once they exist and deleted with their image."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root, IMAGE_VARIANTS_SYNC=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_event(self):
+        event = make_event(save=False)
+        event.image.save('photo.png', png(), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        event.refresh_from_db()
+        return event
+
+    def test_variants_are_recorded_and_linked(self):
+        event = self.create_event()
+        storage = event.image.storage
+
+        self.assertEqual(set(event.image_variants), {'thumb', 'thumb_webp', 'medium', 'medium_webp'})
+        self.assertTrue(all(storage.exists(name) for name in event.image_variants.values()))
+
+        variants = self.client.get('/api/events/%d/' % event.id).data['image_variants']
+        self.assertEqual(variants, {variant: 'http://testserver' + storage.url(name) for variant, name in event.image_variants.items()})
+
+    def test_nothing_is_linked_before_generation(self):
+        event = make_event(save=False)
+        event.image.save('photo.png', png(), save=False)
+        event.save()
+
+        self.assertIsNone(self.client.get('/api/events/%d/' % event.id).data['image_variants'])
+
+    def test_renamed_variants_are_recorded_under_their_saved_name(self):
+        event = make_event(save=False)
+        event.image.save('photo.png', png(), save=False)
+        taken = images.variant_names(event.image.name)['thumb']
+        event.image.storage.save(taken, ContentFile(b'someone else'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        event.refresh_from_db()
+
+        self.assertNotEqual(event.image_variants['thumb'], taken)
+        with event.image.storage.open(taken) as f:
+            self.assertEqual(f.read(), b'someone else')
+
+    def test_replacing_the_image_deletes_the_old_variants(self):
+        event = self.create_event()
+        storage = event.image.storage
+        old = event.image_variants
+
+        event.image = png(color='blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        event.refresh_from_db()
+
+        self.assertFalse(any(storage.exists(name) for name in old.values()))
+        self.assertTrue(event.image_variants)
+        self.assertTrue(all(storage.exists(name) for name in event.image_variants.values()))
+
+    def test_deleting_the_row_deletes_the_variants(self):
+        event = self.create_event()
+        storage = event.image.storage
+        names = event.image_variants.values()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_storing_variants_bumps_the_event_version(self):
+        event = make_event()
+        event.image.save('photo.png', png(), save=False)
+        Event.objects.filter(pk=event.pk).update(image=event.image.name)
+        version = EventVersion.objects.get(event=event).version
+
+        images.store_variants(Event, event.pk, event.image.name)
+        self.assertEqual(EventVersion.objects.get(event=event).version, version + 1)
+
+    def test_fast_path_links_the_same_variants(self):
+        self.user.image.save('avatar.png', png(), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        event = make_event()
+        Task.objects.create(title='Venue', description='', event=event, user=self.user)
+
+        request = Request(APIRequestFactory().get('/'))
+        queryset = Task.objects.filter(event=event)
+        expected = TaskSerializer(queryset, many=True, context={'request': request}).data
+        mapper = fastpath.mapper_for(TaskSerializer)
+        self.assertEqual(mapper.to_representation(mapper.fetch(queryset), request), expected)
+        self.assertEqual(set(expected[0]['image_variants']), {'thumb', 'thumb_webp', 'medium', 'medium_webp'})
+
+    def test_search_stays_in_sync_after_migration(self):
+        # 0016 rebuilds the event and message tables on SQLite.
+        event = make_event()
+        message = Message.objects.create(content='Agenda draft', sender=self.user, event=event)
+        self.assertEqual(list(search.search_events(Event.objects.all(), 'launch')), [event])
+        self.assertEqual(list(search.search_messages(Message.objects.all(), event.id, 'agenda')), [message])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from django.contrib import admin
 from rest_framework.routers import DefaultRouter
@@ -12,19 +13,45 @@ router.register(r'budgetitems', views.BudgetItemViewSet)
 router.register(r'tickets', views.TicketViewSet)
 router.register(r'messages', views.MessageViewSet)
 
-urlpatterns = [
+if getattr(settings, 'ASYNC_READ_VIEWS', False):
+    event_detail_patterns = [path('api/events/<int:pk>/', views.event_detail_async, name='event-detail')]
+    event_tasks = views.event_tasks_async
+    event_teams = views.event_teams_async
+    event_messages = views.event_messages_async
+    organizer_events = views.organizer_events_async
+else:
+    event_detail_patterns = []
+    event_tasks = views.TaskViewSet.as_view({'get': 'event_tasks'})
+    event_teams = views.TeamViewSet.as_view({'get': 'event_teams'})
+    event_messages = views.MessageViewSet.as_view({'get': 'event_messages'})
+    organizer_events = views.EventViewSet.as_view({'get': 'organizer_events'})
+
+urlpatterns = event_detail_patterns + [
     path('', views.index, name='index'),
+    path('api/_metrics/', views.metrics, name='metrics'),
     path('api/', include(router.urls)),
     path('api/token/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('api/csrf/', views.get_csrf_token, name='get_csrf_token'),
-    path('api/events/<int:event_id>/tasks/', views.TaskViewSet.as_view({'get': 'event_tasks'}), name='event-tasks'),
-    path('api/events/<int:event_id>/teams/', views.TeamViewSet.as_view({'get': 'event_teams'}), name='event-teams'),
+    path('api/events/<int:event_id>/tasks/', event_tasks, name='event-tasks'),
+    path('api/events/<int:event_id>/tasks/export/', views.TaskViewSet.as_view({'get': 'event_export'}), name='event-tasks-export'),
+    path('api/events/<int:event_id>/tasks/board/', views.TaskViewSet.as_view({'get': 'event_board'}), name='event-tasks-board'),
+    path('api/events/<int:event_id>/tasks/board/move/', views.TaskViewSet.as_view({'post': 'board_move'}), name='event-tasks-board-move'),
+    path('api/events/<int:event_id>/teams/', event_teams, name='event-teams'),
+    path('api/events/<int:event_id>/teams/export/', views.TeamViewSet.as_view({'get': 'event_export'}), name='event-teams-export'),
     path('api/events/<int:event_id>/budgetitems/', views.BudgetItemViewSet.as_view({'get': 'event_budgetitems'}), name='event-budgetitems'),
+    path('api/events/<int:event_id>/budgetitems/export/', views.BudgetItemViewSet.as_view({'get': 'event_export'}), name='event-budgetitems-export'),
+    path('api/events/<int:event_id>/budget/summary/', views.BudgetItemViewSet.as_view({'get': 'event_budget_summary'}), name='event-budget-summary'),
     path('api/events/<int:event_id>/tickets/', views.TicketViewSet.as_view({'get': 'event_tickets'}), name='event-tickets'),
+    path('api/events/<int:event_id>/tickets/export/', views.TicketViewSet.as_view({'get': 'event_export'}), name='event-tickets-export'),
     path('api/users/<int:user_id>/tickets/', views.TicketViewSet.as_view({'get': 'user_tickets'}), name='user-tickets'),
-    path('api/events/<int:event_id>/messages/', views.MessageViewSet.as_view({'get': 'event_messages'}), name='event-messages'),
+    path('api/events/<int:event_id>/messages/', event_messages, name='event-messages'),
+    path('api/events/<int:event_id>/messages/search/', views.MessageViewSet.as_view({'get': 'search_messages'}), name='event-messages-search'),
+    path('api/events/<int:event_id>/messages/read/', views.MessageViewSet.as_view({'post': 'mark_read'}), name='event-messages-read'),
+    path('api/events/<int:event_id>/messages/stream/', views.event_message_stream, name='event-messages-stream'),
     path('api/users/username/<str:username>/', views.UserViewSet.as_view({'get': 'user_detail'}), name='user-detail'),
-    path('api/me/events/', views.EventViewSet.as_view({'get': 'organizer_events'}), name='organizer-events'),
+    path('api/me/events/', organizer_events, name='organizer-events'),
+    path('api/me/messages/unread/', views.MessageViewSet.as_view({'get': 'unread_counts'}), name='unread-messages'),
+    path('api/me/dashboard/', views.EventViewSet.as_view({'get': 'dashboard'}), name='dashboard'),
     path('api/me/teams/pending/', views.TeamViewSet.as_view({'get': 'pending_teams'}), name='pending-teams'),
 ]
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Per-event version counter used as a strong ETag for the event detail and
+its sub-collections.
+
+The counter lives in EventVersion rather than on Event so that saving an
+Event instance can never write back a stale version. Writes to the event or
+its tasks, teams, budget items, tickets and messages bump it (see
+signals.py); bulk writes bump it explicitly.
+
+Versions are read from the primary, and so is the body of a tagged
+response: clients keep a body for as long as its tag is current, so one
+built from a replica snapshot older than the tag would never be replaced.
+"""
+import functools
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import membership, routers
+from .models import Event, EventVersion
+
+
+def bump(*event_ids):
+    # Only existing rows are bumped: creating one here could race an Event
+    # delete whose cascade is what triggered the bump.
+    EventVersion.objects.filter(event_id__in=event_ids).update(version=F('version') + 1)
+
+
+def bump_for_user(user_id):
+    EventVersion.objects.filter(event__teams__user_id=user_id).update(version=F('version') + 1)
+
+
+def etag(event_id):
+    try:
+        event_id = int(event_id)
+    except (TypeError, ValueError):
+        return None
+
+    version = EventVersion.objects.using(DEFAULT_DB_ALIAS).filter(event_id=event_id).values_list('version', flat=True).first()
+    if version is None:
+        if not Event.objects.using(DEFAULT_DB_ALIAS).filter(pk=event_id).exists():
+            return None
+        # Events that predate versioning get their row on first read.
+        version = EventVersion.objects.get_or_create(event_id=event_id)[0].version
+    return '"%d.%d"' % (event_id, version)
+
+
+def matches(request, tag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+
+    tags = parse_etags(header)
+    return '*' in tags or tag in tags or ('W/' + tag) in tags
+
+
+def conditional_on_event(event_kwarg='event_id', members_only=True):
+    """
+    Answer If-None-Match with 304 before the wrapped action runs its
+    queryset, and tag successful responses with the event's ETag.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            event_id = kwargs.get(event_kwarg)
+
+            if members_only and not membership.is_member(request, event_id):
+                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+            tag = etag(event_id)
+            if tag is not None and matches(request, tag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = tag
+                return response
+
+            if tag is not None:
+                routers.pin()
+            response = view_method(self, request, *args, **kwargs)
+            if tag is not None and response.status_code == status.HTTP_200_OK:
+                response['ETag'] = tag
+            return response
+        return wrapper
+    return decorator
@@ -5,13 +5,39 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from .models import User, Event, Task, Team, BudgetItem, Ticket, Message
-from .serializers import UserSerializer, EventSerializer, TaskSerializer, TeamSerializer, BudgetItemSerializer, TicketSerializer, MessageSerializer
-from django.http import JsonResponse
+from .models import User, Event, Task, Team, BudgetItem, Ticket, TicketBatch, Message, ArchivedMessage, MessageReadCursor, ROLE_CHOICES, STATUS_CHOICES
+from .serializers import UserSerializer, EventSerializer, DashboardEventSerializer, OrganizerEventSerializer, TaskSerializer, TeamSerializer, BudgetItemSerializer, EventBudgetSerializer, TicketSerializer, MessageSerializer
+from .pagination import EventPagination, MessageCursorPagination, MessageSearchPagination
+from .renderers import FastJSONRenderer
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes, action
-from django.db.models import Prefetch, Subquery, OuterRef, F
+from rest_framework.exceptions import APIException, AuthenticationFailed, ValidationError
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+from .authentication import CachedJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from django.db.models import Count, Q, F, FilteredRelation, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from asgiref.sync import sync_to_async
+from . import budget, exports, fastpath, membership, responsecache, routers, search, sparse, versions
+from .sparse import SparseFieldsViewMixin
+from .versions import conditional_on_event
+from .broker import broker
+from .metrics import registry as metrics_registry
+import asyncio
+import datetime
+import functools
+import decimal
+import hashlib
+import json
 import logging
+import secrets
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +57,16 @@ def get_csrf_token(request):
     csrf_token = get_token(request)
     return JsonResponse({'csrfToken': csrf_token})
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def metrics(request):
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Create your views here.
 def index(request):
     return render(request, 'coeventplannerapp/index.html')
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
@@ -89,9 +120,120 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
-class EventViewSet(viewsets.ModelViewSet):
+def _catalogue_datetime(value, param, end_of_day=False):
+    # A bare date first: parse_datetime() would read it as midnight.
+    try:
+        day = parse_date(value)
+        parsed = parse_datetime(value) if day is None else None
+    except ValueError:
+        # Well formed but out of range, e.g. month 13.
+        day = parsed = None
+    if day is not None:
+        parsed = datetime.datetime.combine(day, datetime.time.max if end_of_day else datetime.time.min)
+    if parsed is None:
+        raise ValidationError({param: "Enter a valid date or datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _catalogue_decimal(value, param):
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        raise ValidationError({param: "Enter a valid number."})
+
+
+def _task_counts(event_ids):
+    """Task counts per STATUS_CHOICES value for each event, in one grouped query."""
+    counts = {event_id: {key: 0 for key, _ in STATUS_CHOICES} for event_id in event_ids}
+    if not event_ids:
+        return counts
+
+    rows = (
+        Task.objects.filter(event_id__in=event_ids)
+        .values('event_id')
+        .annotate(**{key: Count('id', filter=Q(status=key)) for key, _ in STATUS_CHOICES})
+        .order_by()
+    )
+    for row in rows:
+        event_id = row.pop('event_id')
+        counts[event_id] = row
+    return counts
+
+
+def _event_counts(event_ids):
+    """
+    (member_count, pending_invitation_count, tickets_sold, task_counts) for
+    each event. Every related table is aggregated by its own grouped query:
+    joining teams, tasks and tickets in one GROUP BY would multiply their
+    rows against each other.
+    """
+    if not event_ids:
+        return {}
+
+    teams = {
+        row['event_id']: row
+        for row in Team.objects.filter(event_id__in=event_ids)
+        .values('event_id')
+        .annotate(
+            members=Count('id', filter=Q(invitation_status=True)),
+            pending=Count('id', filter=Q(invitation_status=False)),
+        )
+        .order_by()
+    }
+    tickets = dict(
+        Ticket.objects.filter(event_id__in=event_ids)
+        .values('event_id')
+        .annotate(sold=Count('id'))
+        .order_by()
+        .values_list('event_id', 'sold')
+    )
+    task_counts = _task_counts(event_ids)
+
+    counts = {}
+    for event_id in event_ids:
+        team_row = teams.get(event_id, {})
+        counts[event_id] = (
+            team_row.get('members', 0),
+            team_row.get('pending', 0),
+            tickets.get(event_id, 0),
+            task_counts[event_id],
+        )
+    return counts
+
+
+def _organizer_events_queryset(queryset, user, params):
+    # role is read from the same Team join that restricts the events to the
+    # user's, so both conditions go into a single filter().
+    conditions = {'teams__user': user}
+    role = params.get('role')
+    if role:
+        if role not in dict(ROLE_CHOICES):
+            raise ValidationError({'role': "Select a valid choice."})
+        conditions['teams__role'] = role
+
+    queryset = queryset.filter(**conditions).annotate(role=F('teams__role'))
+
+    ordering = params.get('ordering')
+    if ordering:
+        if ordering not in ('date', '-date'):
+            raise ValidationError({'ordering': "Use 'date' or '-date'."})
+        return queryset.order_by(ordering, 'id')
+    return queryset.order_by('id')
+
+
+def _with_event_counts(events):
+    counts = _event_counts([event.id for event in events])
+    for event in events:
+        event.member_count, event.pending_invitation_count, event.tickets_sold, event.task_counts = counts[event.id]
+    return events
+
+
+class EventViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    pagination_class = EventPagination
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -102,66 +244,158 @@ class EventViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         if self.action == 'organizer_events':
-            queryset = super().get_queryset()
-            user = self.request.user
-            queryset = queryset.filter(teams__user=user)
-            queryset = queryset.annotate(
-                role=Subquery(
-                    Team.objects.filter(
-                        event=OuterRef('pk'),
-                        user=user
-                    ).values('role')[:1]
-                )
-            );
-            queryset = queryset.prefetch_related(
-                Prefetch('teams', queryset=Team.objects.filter(user=user))
-            )
-            return queryset
+            return _organizer_events_queryset(super().get_queryset(), self.request.user, self.request.query_params)
+
+        if self.action == 'list':
+            # Cached bodies outlive a replica snapshot, see responsecache.py.
+            return self.filter_catalogue(super().get_queryset().using(DEFAULT_DB_ALIAS))
+        if self.action == 'retrieve':
+            return super().get_queryset().using(DEFAULT_DB_ALIAS)
         
         return super().get_queryset()
+
+    def filter_catalogue(self, queryset):
+        params = self.request.query_params
+
+        if params.get('date_after'):
+            queryset = queryset.filter(date__gte=_catalogue_datetime(params['date_after'], 'date_after'))
+        if params.get('date_before'):
+            queryset = queryset.filter(date__lte=_catalogue_datetime(params['date_before'], 'date_before', end_of_day=True))
+        if params.get('location'):
+            queryset = queryset.filter(location=params['location'])
+        if params.get('min_price'):
+            queryset = queryset.filter(price__gte=_catalogue_decimal(params['min_price'], 'min_price'))
+        if params.get('max_price'):
+            queryset = queryset.filter(price__lte=_catalogue_decimal(params['max_price'], 'max_price'))
+
+        if params.get('search'):
+            return search.search_events(queryset, params['search'])
+        return queryset.order_by('date', 'id')
+    
+    def list(self, request, *args, **kwargs):
+        return responsecache.cached_response(
+            responsecache.list_key(request),
+            lambda: super(EventViewSet, self).list(request, *args, **kwargs),
+        )
+    
+    @conditional_on_event(event_kwarg='pk', members_only=False)
+    def retrieve(self, request, *args, **kwargs):
+        return responsecache.cached_response(
+            responsecache.detail_key(request, kwargs['pk']),
+            lambda: super(EventViewSet, self).retrieve(request, *args, **kwargs),
+        )
     
     @action(detail=False, methods=['get'], url_path='organizer-events/')
     def organizer_events(self, request):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        events = _with_event_counts(list(sparse.optimize(self.get_queryset(), OrganizerEventSerializer, request)))
+        serializer = OrganizerEventSerializer(events, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='me/dashboard/')
+    def dashboard(self, request):
+        # Three queries however many events the user belongs to: memberships
+        # with their events, task counts grouped by event and status, and
+        # upcoming tickets.
+        teams = list(Team.objects.filter(user=request.user).select_related('event', 'user').order_by('event__date', 'event_id'))
+
+        task_counts = _task_counts([team.event_id for team in teams])
+
+        events = []
+        for team in teams:
+            event = team.event
+            event.role = team.role
+            event.task_counts = task_counts[event.id]
+            events.append(event)
+
+        tickets = (
+            Ticket.objects.filter(user=request.user, event__date__gte=timezone.now())
+            .select_related('event')
+            .order_by('event__date', 'id')
+        )
+
+        context = self.get_serializer_context()
+        return Response({
+            'events': DashboardEventSerializer(events, many=True, context=context).data,
+            'pending_invitations': TeamSerializer([team for team in teams if not team.invitation_status], many=True, context=context).data,
+            'upcoming_tickets': TicketSerializer(tickets, many=True, context=context).data,
+        })
     
     
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().update(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.id):
+            return super().update(request, *args, **kwargs)
             
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
         
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().partial_update(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.id):
+            return super().partial_update(request, *args, **kwargs)
             
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().destroy(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.id):
+            return super().destroy(request, *args, **kwargs)
             
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+def _board_page_size(params):
+    page_size = getattr(settings, 'TASK_BOARD_PAGE_SIZE', 50)
+    value = params.get('page_size')
+    if value is not None:
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({'page_size': "Enter a whole number."})
+        if page_size < 1:
+            raise ValidationError({'page_size': "Ensure this value is greater than or equal to 1."})
+    return min(page_size, getattr(settings, 'TASK_BOARD_MAX_PAGE_SIZE', 200))
+
+
+def _board_column(request, task_status, count, rows, page_size, mapper):
+    """
+    One board column. `rows` holds up to page_size + 1 tasks ordered by id;
+    the extra row only tells whether there is a next page.
+    """
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'column', task_status)
+        next_url = replace_query_param(next_url, 'after', rows[-1].id)
+    return {'status': task_status, 'count': count, 'next': next_url, 'results': mapper.to_representation(rows, request)}
+
+
+def _board_assignees(tasks):
+    """Open, in-progress and completed task counts per assignee, in one grouped query."""
+    rows = (
+        tasks.values('user_id', 'user__username')
+        .annotate(
+            open=Count('id', filter=~Q(status__in=['in_progress', 'completed'])),
+            in_progress=Count('id', filter=Q(status='in_progress')),
+            completed=Count('id', filter=Q(status='completed')),
+        )
+        .order_by('user__username', 'user_id')
+    )
+    return [
+        {'user': row['user_id'], 'username': row['user__username'], 'open': row['open'], 'in_progress': row['in_progress'], 'completed': row['completed']}
+        for row in rows
+    ]
+
+
+class TaskViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # For list and retrieve actions, return all tasks for the event
-        if self.action in ['list', 'retrieve', 'event_tasks']:
+        if self.action in ['list', 'retrieve', 'event_tasks', 'event_board']:
             event_id = self.kwargs.get('event_id')
             if event_id:
                 return Task.objects.filter(event_id=event_id).select_related('user')
@@ -175,13 +409,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         event_id = request.data.get('event')
         
         # Check if the logged-in user is an organizer for this event
-        is_organizer = Team.objects.filter(
-            event_id=event_id,
-            user=request.user,
-            role='organizer'
-        ).exists()
-        
-        if not is_organizer:
+        if not membership.is_organizer(request, event_id):
             return Response(
                 {"detail": "Only organizers can create tasks"}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -195,11 +423,94 @@ class TaskViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'], url_path='event-tasks/(?P<event_id>\d+)')
+    @conditional_on_event()
     def event_tasks(self, request, event_id=None):
         self.kwargs['event_id'] = event_id
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        mapper = fastpath.mapper_for(self.get_serializer_class(), sparse.selected_fields(self.get_serializer_class(), request))
+        return Response(mapper.to_representation(mapper.fetch(self.get_queryset()), request))
+
+    @action(detail=False, methods=['get'], url_path='event-tasks/(?P<event_id>\d+)/export')
+    def event_export(self, request, event_id=None):
+        if not membership.is_organizer(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return exports.export_response(request, self.get_serializer_class(), Task.objects.filter(event=event_id), 'event-%s-tasks' % event_id)
+
+    @action(detail=False, methods=['get'], url_path='event-tasks/(?P<event_id>\d+)/board')
+    @conditional_on_event()
+    def event_board(self, request, event_id=None):
+        """
+        The event's tasks as board columns, one per status, each holding its
+        first page of tasks by id. ?column=<status>&after=<id> returns the
+        next page of a single column.
+        """
+        self.kwargs['event_id'] = event_id
+        tasks = self.get_queryset()
+        page_size = _board_page_size(request.query_params)
+        mapper = fastpath.mapper_for(self.get_serializer_class(), sparse.selected_fields(self.get_serializer_class(), request), ('id', 'status'))
+
+        column = request.query_params.get('column')
+        if column is not None:
+            try:
+                after = int(request.query_params.get('after', 0))
+            except ValueError:
+                raise ValidationError({'after': "Enter a whole number."})
+            column_tasks = tasks.filter(status=column)
+            rows = list(mapper.fetch(column_tasks.filter(id__gt=after).order_by('id')[:page_size + 1]))
+            return Response(_board_column(request, column, column_tasks.count(), rows, page_size, mapper))
+
+        counts = dict(tasks.values('status').annotate(count=Count('id')).order_by().values_list('status', 'count'))
+        # The model's default status, 'pending', is not one of STATUS_CHOICES.
+        statuses = [key for key, _ in STATUS_CHOICES]
+        statuses += sorted(set(counts) - set(statuses))
+
+        # The first page of every column in one query.
+        ranked = tasks.annotate(position=Window(RowNumber(), partition_by=F('status'), order_by=F('id').asc()))
+        columns = {key: [] for key in statuses}
+        for row in mapper.fetch(ranked.filter(position__lte=page_size + 1).order_by('status', 'id')):
+            columns[row.status].append(row)
+
+        return Response({
+            'columns': [_board_column(request, key, counts.get(key, 0), columns[key], page_size, mapper) for key in statuses],
+            'assignees': _board_assignees(tasks),
+        })
+
+    @action(detail=False, methods=['post'], url_path='event-tasks/(?P<event_id>\d+)/board/move')
+    def board_move(self, request, event_id=None):
+        moves = request.data.get('moves', None)
+        max_moves = getattr(settings, 'TASK_BOARD_MOVE_MAX', 1000)
+
+        if not membership.is_organizer(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        if not isinstance(moves, list) or not 0 < len(moves) <= max_moves:
+            return Response({"detail": "moves must be a list of 1 to %d moves." % max_moves}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A card moved twice in one request ends up where it was moved last.
+        statuses = {}
+        for move in moves:
+            try:
+                task_id = int(move['id'])
+            except (KeyError, TypeError, ValueError):
+                return Response({"detail": "Each move needs a task id and a status."}, status=status.HTTP_400_BAD_REQUEST)
+            if move.get('status') not in dict(STATUS_CHOICES):
+                return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
+            statuses[task_id] = move['status']
+
+        with transaction.atomic():
+            tasks = list(Task.objects.select_for_update().filter(event_id=event_id, id__in=statuses).only('id', 'status'))
+            if len(tasks) != len(statuses):
+                return Response({"detail": "Some of these tasks do not belong to this event."}, status=status.HTTP_400_BAD_REQUEST)
+
+            moved = [task for task in tasks if task.status != statuses[task.id]]
+            for task in moved:
+                task.status = statuses[task.id]
+            Task.objects.bulk_update(moved, ['status'])
+
+            # bulk_update bypasses the Task signals.
+            if moved:
+                versions.bump(event_id)
+
+        return Response({'updated': len(moved)})
 
     def list(self, request, *args, **kwargs):
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
@@ -207,10 +518,9 @@ class TaskViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.event.teams.all():
-            if request.user == member.user:
-                instance = Task.objects.select_related('user').get(pk=instance.id)
-                return super().retrieve(request, *args, **kwargs)
+        if membership.is_member(request, instance.event_id):
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
 
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
@@ -218,18 +528,16 @@ class TaskViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().update(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.event_id):
+            return super().update(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().partial_update(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.event_id):
+            return super().partial_update(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
@@ -237,13 +545,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
 
         # Check if the logged-in user is an organizer for this event
-        is_organizer = Team.objects.filter(
-            event_id=instance.event.id,
-            user=request.user,
-            role='organizer'
-        ).exists()
-        
-        if not is_organizer:
+        if not membership.is_organizer(request, instance.event_id):
             return Response(
                 {"detail": "Only organizers can delete tasks"}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -251,7 +553,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         return super().destroy(request, *args, **kwargs)
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
 
@@ -262,47 +564,43 @@ class TeamViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if self.action == 'event_teams':
             event_id = self.kwargs.get('event_id', None)
-            queryset = super().get_queryset()
+            queryset = super().get_queryset().select_related('user', 'event')
 
             if event_id:
-                event = Event.objects.get(pk=event_id)
-
-                for member in event.teams.all():
-                    if self.request.user == member.user:
-                        queryset = queryset.filter(event=event_id)
-                        return queryset
-                
-                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+                return queryset.filter(event=event_id)
             
         if self.action == 'pending_teams':
-            queryset = super().get_queryset()
+            queryset = super().get_queryset().select_related('event', 'user')
             queryset = queryset.filter(invitation_status=False, user=self.request.user)
             return queryset
         
 
-        return super().get_queryset()
+        return super().get_queryset().select_related('user', 'event')
     
     @action(detail=False, methods=['get'], url_path='me/teams/pending/')
     def pending_teams(self, request):
-        queryset = self.get_queryset().filter(
-            user=request.user,
-            invitation_status=False
-        ).select_related('event', 'user')
+        queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
         
     @action(detail=False, methods=['get'], url_path='event-teams/(?P<event_id>\d+)')
+    @conditional_on_event()
     def event_teams(self, request, event_id=None):
-        queryset = self.get_queryset().filter(event=event_id).select_related('user')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        self.kwargs['event_id'] = event_id
+        mapper = fastpath.mapper_for(self.get_serializer_class(), sparse.selected_fields(self.get_serializer_class(), request))
+        return Response(mapper.to_representation(mapper.fetch(self.get_queryset()), request))
+    
+    @action(detail=False, methods=['get'], url_path='event-teams/(?P<event_id>\d+)/export')
+    def event_export(self, request, event_id=None):
+        if not membership.is_organizer(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return exports.export_response(request, self.get_serializer_class(), Team.objects.filter(event=event_id), 'event-%s-teams' % event_id)
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        for member in instance.event.teams.all():
-            if request.user == member.user:
-                return super().retrieve(request, *args, **kwargs)
+        if membership.is_member(request, instance.event_id):
+            return super().retrieve(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
@@ -317,28 +615,85 @@ class TeamViewSet(viewsets.ModelViewSet):
         except Event.DoesNotExist:
             return Response({"detail": "Event does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
-        for member in event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                username = request.data.get('username')
-
-                try:
-                    user = User.objects.get(username=username)
-                except User.DoesNotExist:
-                    return Response({"detail": "User does not exist."}, status=status.HTTP_400_BAD_REQUEST)
-                
-                data = request.data.copy()
-                data['user'] = user.id
-                data['event'] = event.id
-                request.data.pop('username', None)
-
-                serializer = self.get_serializer(data=data)
-                serializer.is_valid(raise_exception=True)
-                self.perform_create(serializer)
-                headers = self.get_success_headers(serializer.data)
-                return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-                
+        if membership.is_organizer(request, event.id):
+            username = request.data.get('username')
+
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                return Response({"detail": "User does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            data = request.data.copy()
+            data['user'] = user.id
+            data['event'] = event.id
+            request.data.pop('username', None)
+
+            serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            headers = self.get_success_headers(serializer.data)
+            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_invite(self, request):
+        event_id = request.data.get('event', None)
+        usernames = request.data.get('usernames', None)
+        role = request.data.get('role', 'participant')
+        max_invitations = getattr(settings, 'TEAM_BULK_MAX', 1000)
+
+        if not event_id:
+            return Response({"detail": "Event ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not isinstance(usernames, list) or not 0 < len(usernames) <= max_invitations:
+            return Response({"detail": "usernames must be a list of 1 to %d usernames." % max_invitations}, status=status.HTTP_400_BAD_REQUEST)
+
+        if role not in dict(ROLE_CHOICES):
+            return Response({"detail": "Invalid role."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            event = Event.objects.get(pk=event_id)
+        except (Event.DoesNotExist, ValueError, TypeError):
+            return Response({"detail": "Event does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not membership.is_organizer(request, event.id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        usernames = list(dict.fromkeys(str(username) for username in usernames))
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        members = set(Team.objects.filter(event=event, user__in=users.values()).values_list('user_id', flat=True))
+
+        teams = [
+            Team(user=users[username], event=event, role=role, invitation_status=False)
+            for username in usernames
+            if username in users and users[username].id not in members
+        ]
+
+        try:
+            with transaction.atomic():
+                Team.objects.bulk_create(teams)
+        except IntegrityError:
+            return Response({"detail": "Some of these users were invited concurrently, please retry."}, status=status.HTTP_409_CONFLICT)
+
+        # bulk_create bypasses the Team signals.
+        for team in teams:
+            membership.invalidate(team.user_id, team.event_id)
+        if teams:
+            versions.bump(event.id)
+
+        created = {team.user_id: team for team in teams}
+        results = []
+        for username in usernames:
+            user = users.get(username)
+            if user is None:
+                results.append({'username': username, 'status': 'not_found'})
+            elif user.id in created:
+                results.append({'username': username, 'status': 'invited', 'team': self.get_serializer(created[user.id]).data})
+            else:
+                results.append({'username': username, 'status': 'already_member'})
+
+        return Response(results, status=status.HTTP_201_CREATED if teams else status.HTTP_200_OK)
     
     def list(self, request, *args, **kwargs):
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
@@ -350,19 +705,8 @@ class TeamViewSet(viewsets.ModelViewSet):
         #print(request.data)
         instance = self.get_object()
         user = request.user
-        is_organizer = False
-
-        #print(user)
-
-        for member in instance.event.teams.filter(role='organizer'):
-            #print(member.user)
-            if user == member.user:
-                is_organizer = True
-                break
-        
-        is_invited = instance.user == user and instance.invitation_status == False
-
-        print(is_invited)
+        is_organizer = membership.is_organizer(request, instance.event_id)
+        is_invited = instance.user_id == user.id and instance.invitation_status == False
 
         if is_organizer and 'role' in request.data:
             instance.role = request.data['role']
@@ -379,13 +723,12 @@ class TeamViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        for member in instance.event.teams.all():
-            if request.user == member.user:
-                return super().destroy(request, *args, **kwargs)
+        if membership.is_member(request, instance.event_id):
+            return super().destroy(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
 
-class BudgetItemViewSet(viewsets.ModelViewSet):
+class BudgetItemViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = BudgetItem.objects.all()
     serializer_class = BudgetItemSerializer
 
@@ -399,49 +742,50 @@ class BudgetItemViewSet(viewsets.ModelViewSet):
             queryset = super().get_queryset()
 
             if event_id:
-                event = Event.objects.get(pk=event_id)
-
-                for member in event.teams.all():
-                    if self.request.user == member.user:
-                        queryset = queryset.filter(event=event_id)
-                        return queryset
-                
-                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+                return queryset.filter(event=event_id)
         
         return super().get_queryset()
         
     @action(detail=False, methods=['get'], url_path='event-budgetitems/(?P<event_id>\d+)')
+    @conditional_on_event()
     def event_budgetitems(self, request, event_id=None):
         self.kwargs['event_id'] = event_id
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='event-budgetitems/(?P<event_id>\d+)/export')
+    def event_export(self, request, event_id=None):
+        if not membership.is_organizer(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return exports.export_response(request, self.get_serializer_class(), BudgetItem.objects.filter(event=event_id), 'event-%s-budgetitems' % event_id)
+    
+    @action(detail=False, methods=['get'], url_path='event-budget-summary/(?P<event_id>\d+)')
+    @conditional_on_event()
+    def event_budget_summary(self, request, event_id=None):
+        summary = budget.get_summary(event_id)
+        if summary is None:
+            return Response({"detail": "Event does not exist."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(EventBudgetSerializer(summary, context=self.get_serializer_context()).data)
+    
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        logger.info('retrieve')
         
-        for member in instance.event.teams.all():
-            logger.info(member.user)
-            if request.user == member.user:
-                logger.info(request.user)
-                return super().retrieve(request, *args, **kwargs)
+        if membership.is_member(request, instance.event_id):
+            return super().retrieve(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def create(self, request, *args, **kwargs):
-        event = Event.objects.get(pk=request.data['event'])
-        
-        for member in event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().create(request, *args, **kwargs)
+        if membership.is_organizer(request, request.data.get('event')):
+            return super().create(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        if instance.event.teams.filter(user=request.user, role='organizer').exists():
+        if membership.is_organizer(request, instance.event_id):
             return super(BudgetItemViewSet, self).partial_update(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform partial update this action."}, status=status.HTTP_403_FORBIDDEN)
@@ -449,13 +793,12 @@ class BudgetItemViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        for member in instance.event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                return super().destroy(request, *args, **kwargs)
+        if membership.is_organizer(request, instance.event_id):
+            return super().destroy(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
 
@@ -471,6 +814,92 @@ class TicketViewSet(viewsets.ModelViewSet):
             return super().create(request, *args, **kwargs)
         else:
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_issue(self, request):
+        event_id = request.data.get('event', None)
+        count = request.data.get('count', None)
+        holders = request.data.get('holders', None)
+        max_tickets = getattr(settings, 'TICKET_BULK_MAX', 500)
+
+        if (count is None) == (holders is None):
+            return Response({"detail": "Provide either count or holders."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            event = Event.objects.get(pk=event_id)
+        except (Event.DoesNotExist, ValueError, TypeError):
+            return Response({"detail": "Event does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if holders is None:
+                count = int(count)
+            elif isinstance(holders, list):
+                count = len(holders)
+            else:
+                raise TypeError
+        except (ValueError, TypeError):
+            return Response({"detail": "count must be an integer and holders a list of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Checked before holder_ids is built, so that a huge count is never allocated.
+        if not 0 < count <= max_tickets:
+            return Response({"detail": "Between 1 and %d tickets can be issued at once." % max_tickets}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if holders is None:
+                holder_ids = [request.user.id] * count
+            else:
+                holder_ids = [int(holder) for holder in holders]
+        except (ValueError, TypeError):
+            return Response({"detail": "count must be an integer and holders a list of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Anyone may buy tickets for themselves, only organizers may issue them to others.
+        if any(holder_id != request.user.id for holder_id in holder_ids) and not membership.is_organizer(request, event.id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        unique_holders = set(holder_ids)
+        if User.objects.filter(id__in=unique_holders).count() != len(unique_holders):
+            return Response({"detail": "User does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = request.headers.get('Idempotency-Key')
+        fingerprint = hashlib.sha256(json.dumps([event.id, holder_ids]).encode()).hexdigest()
+
+        if key:
+            batch = TicketBatch.objects.filter(user=request.user, idempotency_key=key).first()
+            if batch is not None:
+                return self._replay_batch(batch, fingerprint)
+
+        try:
+            with transaction.atomic():
+                batch = None
+                if key:
+                    batch = TicketBatch.objects.create(idempotency_key=key, fingerprint=fingerprint, user=request.user, event=event)
+
+                codes = _ticket_codes(len(holder_ids))
+                tickets = Ticket.objects.bulk_create([
+                    Ticket(code=code, user_id=holder_id, event=event, batch=batch)
+                    for code, holder_id in zip(codes, holder_ids)
+                ])
+                # bulk_create bypasses the Ticket signals.
+                budget.tickets_changed(event.id, len(tickets))
+                versions.bump(event.id)
+        except IntegrityError:
+            # Either a concurrent retry with the same key won the race, or a
+            # generated code was issued concurrently (Ticket.code is unique).
+            batch = TicketBatch.objects.filter(user=request.user, idempotency_key=key).first() if key else None
+            if batch is None:
+                return Response({"detail": "Some of these tickets were issued concurrently, please retry."}, status=status.HTTP_409_CONFLICT)
+            return self._replay_batch(batch, fingerprint)
+
+        serializer = self.get_serializer(tickets, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def _replay_batch(self, batch, fingerprint):
+        if batch.fingerprint != fingerprint:
+            return Response({"detail": "Idempotency-Key was already used for a different request."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        tickets = batch.tickets.select_related('event').order_by('id')
+        serializer = self.get_serializer(tickets, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
     
     def get_queryset(self):
         if self.action == 'event_tickets':
@@ -478,57 +907,46 @@ class TicketViewSet(viewsets.ModelViewSet):
             queryset = super().get_queryset()
 
             if event_id:
-                event = Event.objects.get(pk=event_id)
-
-                for member in event.teams.all():
-                    if self.request.user == member.user:
-                        queryset = queryset.filter(event=event_id).select_related('event')
-                        return queryset
-                
-                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+                return queryset.filter(event=event_id).select_related('event')
         elif self.action == 'user_tickets':
             user_id = self.kwargs.get('user_id', None)
             queryset = super().get_queryset()
 
             if user_id:
-                user = User.objects.get(pk=user_id)
-
-                if self.request.user == user:
-                    queryset = queryset.filter(user=user_id).select_related('event')
-                    return queryset
-                
-                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+                return queryset.filter(user=user_id).select_related('event')
         else:
             return super().get_queryset().select_related('event')
     
     @action(detail=False, methods=['get'], url_path='event-tickets/(?P<event_id>\d+)')
+    @conditional_on_event()
     def event_tickets(self, request, event_id=None):
         self.kwargs['event_id'] = event_id
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='event-tickets/(?P<event_id>\d+)/export')
+    def event_export(self, request, event_id=None):
+        if not membership.is_organizer(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return exports.export_response(request, self.get_serializer_class(), Ticket.objects.filter(event=event_id), 'event-%s-tickets' % event_id)
+    
     @action(detail=False, methods=['get'], url_path='user-tickets/(?P<user_id>\d+)')
     def user_tickets(self, request, user_id=None):
+        if str(request.user.id) != str(user_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
         self.kwargs['user_id'] = user_id
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        mapper = fastpath.mapper_for(self.get_serializer_class(), sparse.selected_fields(self.get_serializer_class(), request))
+        return Response(mapper.to_representation(mapper.fetch(self.get_queryset()), request))
     
     def list(self, request, *args, **kwargs):
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        guest = instance.user
-        user = request.user
-        is_guest = guest == user
-        is_staff = False
-
-        for member in instance.event.teams.all():
-            if user == member.user:
-                is_staff = True
-                break
+        is_guest = instance.user_id == request.user.id
+        is_staff = membership.is_member(request, instance.event_id)
         
         if is_guest or is_staff:
             return super().retrieve(request, *args, **kwargs)
@@ -543,13 +961,70 @@ class TicketViewSet(viewsets.ModelViewSet):
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        if request.user != instance.user:
+        if request.user.id != instance.user_id:
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
-class MessageViewSet(viewsets.ModelViewSet):
+def _ticket_codes(count):
+    codes = set()
+
+    while len(codes) < count:
+        candidates = {secrets.token_urlsafe(12) for _ in range(count - len(codes))}
+        candidates -= set(Ticket.objects.filter(code__in=candidates).values_list('code', flat=True))
+        codes |= candidates
+
+    return list(codes)
+
+# Read by MessageCursorPagination whatever fields were requested.
+CURSOR_COLUMNS = ('id', 'created_at')
+
+
+def _advance_read_cursor(user, event_id, last_read_at, last_read_id):
+    cursors = MessageReadCursor.objects.filter(user=user, event_id=event_id)
+    # Conditional, so that a concurrent request for a later message wins.
+    earlier = cursors.filter(Q(last_read_at__lt=last_read_at) | Q(last_read_at=last_read_at, last_read_id__lt=last_read_id))
+
+    if earlier.update(last_read_at=last_read_at, last_read_id=last_read_id) or cursors.exists():
+        return
+    try:
+        with transaction.atomic():
+            MessageReadCursor.objects.create(user=user, event_id=event_id, last_read_at=last_read_at, last_read_id=last_read_id)
+    except IntegrityError:
+        # A concurrent first read created the cursor in between.
+        earlier.update(last_read_at=last_read_at, last_read_id=last_read_id)
+
+
+def _unread_counts(user, event_ids):
+    """
+    Messages from other members after the user's read cursor, per event, in
+    one grouped query over the (event, created_at, id) index. Events without
+    unread messages are left out.
+    """
+    if not event_ids:
+        return {}
+
+    cursor = FilteredRelation('event__message_read_cursors', condition=Q(event__message_read_cursors__user=user))
+    after_cursor = (
+        Q(cursor__isnull=True)
+        | Q(created_at__gt=F('cursor__last_read_at'))
+        | Q(created_at=F('cursor__last_read_at'), id__gt=F('cursor__last_read_id'))
+    )
+    return dict(
+        Message.objects.filter(event_id__in=event_ids)
+        .exclude(sender=user)
+        .annotate(cursor=cursor)
+        .filter(after_cursor)
+        .values('event_id')
+        .annotate(unread=Count('id'))
+        .order_by()
+        .values_list('event_id', 'unread')
+    )
+
+
+class MessageViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    pagination_class = MessageCursorPagination
 
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
@@ -561,67 +1036,115 @@ class MessageViewSet(viewsets.ModelViewSet):
             queryset = super().get_queryset()
 
             if event_id:
-                event = Event.objects.get(pk=event_id)
-
-                for member in event.teams.all():
-                    if self.request.user == member.user:
-                        queryset = queryset.filter(event=event_id).select_related('sender')
-                        return queryset
-                
-                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+                return queryset.filter(event=event_id).select_related('sender')
         
         return super().get_queryset().select_related('sender')
     
     @action(detail=False, methods=['get'], url_path='event-messages/(?P<event_id>\d+)')
+    @conditional_on_event()
     def event_messages(self, request, event_id=None):
         self.kwargs['event_id'] = event_id
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer_class = self.get_serializer_class()
+        mapper = fastpath.mapper_for(serializer_class, sparse.selected_fields(serializer_class, request), CURSOR_COLUMNS)
+        archived = mapper.fetch(ArchivedMessage.objects.filter(event=event_id))
+        page = self.paginator.paginate_queryset(mapper.fetch(self.get_queryset()), request, view=self, archive=archived)
+        return self.get_paginated_response(mapper.to_representation(page, request))
+
+    @action(detail=False, methods=['get'], url_path='event-messages/(?P<event_id>\d+)/search')
+    @conditional_on_event()
+    def search_messages(self, request, event_id=None):
+        """
+        Ranked pages of the event's messages matching ?q=, with highlighted
+        snippets. Archived messages are not indexed and never match.
+        """
+        queryset = search.search_messages(self.filter_queryset(self.get_queryset()), event_id, request.query_params.get('q', ''))
+        paginator = MessageSearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        data = self.get_serializer(page, many=True).data
+        for item, message in zip(data, page):
+            item['snippet'] = search.highlight(message.search_snippet)
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['post'], url_path='event-messages/(?P<event_id>\d+)/read')
+    def mark_read(self, request, event_id=None):
+        """
+        Advance the user's read cursor to `message`, or to the event's newest
+        message when none is given. `message` may be an archived message. The
+        cursor never moves back.
+        """
+        if not membership.is_member(request, event_id):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        message_id = request.data.get('message', None)
+        if message_id is not None:
+            try:
+                message_id = int(message_id)
+            except (TypeError, ValueError):
+                return Response({"detail": "Message does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Archived messages are older than every hot one, so the archive is
+        # only read when the hot table has no match.
+        for model in (Message, ArchivedMessage):
+            messages = model.objects.filter(event_id=event_id)
+            if message_id is None:
+                messages = messages.order_by('-created_at', '-id')
+            else:
+                messages = messages.filter(pk=message_id)
+            position = messages.values_list('created_at', 'id').first()
+            if position is not None:
+                break
+
+        if position is None and message_id is not None:
+            return Response({"detail": "Message does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if position is not None:
+            _advance_read_cursor(request.user, event_id, *position)
+
+        event_id = int(event_id)
+        return Response({'event': event_id, 'unread': _unread_counts(request.user, [event_id]).get(event_id, 0)})
+
+    @action(detail=False, methods=['get'], url_path='me/messages/unread/')
+    def unread_counts(self, request):
+        event_ids = list(Team.objects.filter(user=request.user).order_by('event_id').values_list('event_id', flat=True))
+        counts = _unread_counts(request.user, event_ids)
+        return Response([{'event': event_id, 'unread': counts.get(event_id, 0)} for event_id in event_ids])
     
     def list(self, request, *args, **kwargs):
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        
-        for member in instance.event.teams.all():
-            if request.user == member.user:
-                return super().retrieve(request, *args, **kwargs)
+
+        if membership.is_member(request, instance.event_id):
+            return super().retrieve(request, *args, **kwargs)
         
         return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     def create(self, request, *args, **kwargs):
-        event = Event.objects.get(pk=request.data['event'])
         sender = request.data['sender']
         is_user = int(sender) == request.user.id
-        is_member = False
-
-        for member in event.teams.all():
-            if request.user == member.user:
-                is_member = True
-                break
+        is_member = membership.is_member(request, request.data['event'])
         
         if is_user and is_member:
             return super().create(request, *args, **kwargs)
         else:
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
+    def perform_create(self, serializer):
+        message = serializer.save()
+        data = serializer.data
+        transaction.on_commit(lambda: broker.publish(message.event_id, message.id, data))
+
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
-        if request.user != instance.sender:
+        if request.user.id != instance.sender_id:
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
         return super().partial_update(request, *args, **kwargs)
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        is_sender = request.user == instance.sender
-        is_organizer = False
-
-        for member in instance.event.teams.filter(role='organizer'):
-            if request.user == member.user:
-                is_organizer = True
-                break
+        is_sender = request.user.id == instance.sender_id
+        is_organizer = membership.is_organizer(request, instance.event_id)
 
         if is_sender or is_organizer:
             return super().destroy(request, *args, **kwargs)
@@ -629,3 +1152,284 @@ class MessageViewSet(viewsets.ModelViewSet):
             return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
 
 
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def _stream_user(request):
+    # EventSource cannot send an Authorization header, so the access token
+    # may also be passed as ?access_token=.
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('access_token')
+
+    if not raw_token:
+        return None
+
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _stream_backlog(request, event_id, last_event_id):
+    """
+    Messages after Last-Event-ID, at most one cursor page of the newest ones,
+    oldest first. Anything older than that is read through the messages
+    endpoint, as after any other gap.
+    """
+    # From the primary: a message committed before subscribe() but missing
+    # from the replica snapshot would never reach this client otherwise.
+    queryset = Message.objects.using(DEFAULT_DB_ALIAS).filter(event_id=event_id, id__gt=last_event_id).select_related('sender')
+    messages = list(queryset.order_by('-id')[:MessageCursorPagination.page_size])[::-1]
+    return [(message.id, data) for message, data in zip(messages, MessageSerializer(messages, many=True, context={'request': request}).data)]
+
+
+def _sse(message_id, data):
+    return 'id: %d\nevent: message\ndata: %s\n\n' % (message_id, json.dumps(data))
+
+
+async def _message_stream(request, event_id, last_event_id):
+    subscription = broker.subscribe(event_id)
+    # Messages published while the backlog was read may also be in it. Ids
+    # are compared by set rather than by order: they are published on commit,
+    # so a lower id can arrive after a higher one.
+    replayed = set()
+
+    try:
+        yield 'retry: 3000\n\n'
+
+        if last_event_id is not None:
+            for message_id, data in await sync_to_async(_stream_backlog)(request, event_id, last_event_id):
+                replayed.add(message_id)
+                yield _sse(message_id, data)
+
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+
+            if item is None:
+                # Too slow to keep up, let the client reconnect with Last-Event-ID.
+                return
+
+            message_id, data = item
+            if message_id in replayed:
+                replayed.discard(message_id)
+                continue
+            yield _sse(message_id, data)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def event_message_stream(request, event_id):
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        user = await request.auser()
+
+    if not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    request.user = user
+
+    if not await sync_to_async(membership.is_member)(request, event_id):
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(_message_stream(request, event_id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Native async versions of the read-heavy actions, routed in place of the
+# viewset actions when ASYNC_READ_VIEWS is set (see urls.py). They answer
+# with the same JSON as the sync path but without the browsable API.
+
+def _async_json(data, status_code=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(FastJSONRenderer().render(data), status=status_code, content_type='application/json')
+    response['Vary'] = 'Accept'
+    for header, value in (headers or {}).items():
+        response[header] = value
+    return response
+
+
+def _async_error(exc, headers=None):
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    return _async_json(data, exc.status_code, headers)
+
+
+async def _async_authenticate(request, required=True):
+    """Set request.user from the JWT, returning an error response if that fails."""
+    authentication = CachedJWTAuthentication()
+    challenge = {'WWW-Authenticate': authentication.authenticate_header(request)}
+
+    try:
+        result = await sync_to_async(authentication.authenticate)(request)
+    except AuthenticationFailed as exc:
+        return _async_error(exc, challenge)
+
+    if result is None:
+        request.user = AnonymousUser()
+        if required:
+            return _async_json({"detail": "Authentication credentials were not provided."}, status.HTTP_401_UNAUTHORIZED, challenge)
+        return None
+
+    request.user = result[0]
+    return None
+
+
+def _not_modified(tag):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    del response['Content-Type']
+    response['ETag'] = tag
+    response['Vary'] = 'Accept'
+    return response
+
+
+def _allow(methods):
+    """Send the Allow header DRF adds to every response of the matching viewset route."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            response = await view(request, *args, **kwargs)
+            response['Allow'] = methods
+            return response
+        return wrapper
+    return decorator
+
+
+async def _async_event_read(request, event_id, load):
+    """
+    Shared body of the async event sub-collection views. The membership
+    check and ETag lookup run concurrently with `load`, unless the client
+    sent If-None-Match, in which case `load` waits for them so that a 304
+    costs no listing query.
+    """
+    error = await _async_authenticate(request)
+    if error is not None:
+        return error
+
+    # The body carries the ETag, which is read from the primary (see versions.py).
+    routers.pin()
+    checks = [sync_to_async(membership.get_role)(request, event_id), sync_to_async(versions.etag)(event_id)]
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        role, tag = await asyncio.gather(*checks)
+        data = None
+    else:
+        # A failed load must not hide a 403, so its error is only raised below.
+        role, tag, data = await asyncio.gather(*checks, load(), return_exceptions=True)
+        for result in (role, tag):
+            if isinstance(result, BaseException):
+                raise result
+
+    if role is None:
+        return _async_json({"detail": "You do not have permission to perform this action."}, status.HTTP_403_FORBIDDEN)
+    if tag is not None and versions.matches(request, tag):
+        return _not_modified(tag)
+
+    try:
+        if data is None:
+            data = await load()
+        elif isinstance(data, BaseException):
+            raise data
+    except APIException as exc:
+        return _async_error(exc)
+    return _async_json(data, headers={'ETag': tag} if tag is not None else None)
+
+
+async def _async_rows(serializer_class, queryset, request):
+    mapper = fastpath.mapper_for(serializer_class, sparse.selected_fields(serializer_class, request))
+    return mapper.to_representation([row async for row in mapper.fetch(queryset)], request)
+
+
+@_allow('GET, HEAD, OPTIONS')
+async def event_tasks_async(request, event_id):
+    return await _async_event_read(
+        request, event_id,
+        lambda: _async_rows(TaskSerializer, Task.objects.filter(event_id=event_id), request),
+    )
+
+
+@_allow('GET, HEAD, OPTIONS')
+async def event_teams_async(request, event_id):
+    return await _async_event_read(
+        request, event_id,
+        lambda: _async_rows(TeamSerializer, Team.objects.filter(event=event_id), request),
+    )
+
+
+@_allow('GET, HEAD, OPTIONS')
+async def event_messages_async(request, event_id):
+    async def load():
+        mapper = fastpath.mapper_for(MessageSerializer, sparse.selected_fields(MessageSerializer, request), CURSOR_COLUMNS)
+        paginator = MessageCursorPagination()
+        archived = mapper.fetch(ArchivedMessage.objects.filter(event=event_id))
+        page = await paginator.apaginate_queryset(mapper.fetch(Message.objects.filter(event=event_id)), Request(request), archive=archived)
+        return paginator.get_paginated_response(mapper.to_representation(page, request)).data
+
+    return await _async_event_read(request, event_id, load)
+
+
+@_allow('GET, HEAD, OPTIONS')
+async def organizer_events_async(request):
+    error = await _async_authenticate(request)
+    if error is not None:
+        return error
+
+    try:
+        queryset = _organizer_events_queryset(Event.objects.all(), request.user, request.GET)
+    except ValidationError as exc:
+        return _async_error(exc)
+
+    queryset = sparse.optimize(queryset, OrganizerEventSerializer, request)
+    events = await sync_to_async(_with_event_counts)([event async for event in queryset])
+    return _async_json(OrganizerEventSerializer(events, many=True, context={'request': request}).data)
+
+
+def _event_detail(request, pk):
+    event = Event.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).first()
+    if event is None:
+        return Response({"detail": "No Event matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(EventSerializer(event, context={'request': request}).data)
+
+
+_event_detail_view = EventViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+
+
+@csrf_exempt
+@_allow('GET, PUT, PATCH, DELETE, HEAD, OPTIONS')
+async def event_detail_async(request, pk):
+    # Writes keep going through the viewset.
+    if request.method not in ('GET', 'HEAD'):
+        return await sync_to_async(_event_detail_view)(request, pk=pk)
+
+    error = await _async_authenticate(request, required=False)
+    if error is not None:
+        return error
+
+    tag = await sync_to_async(versions.etag)(pk)
+    if tag is not None and versions.matches(request, tag):
+        return _not_modified(tag)
+
+    drf_request = Request(request)
+
+    def cached():
+        # detail_key() reads the cache too, so it has to run off the event loop.
+        return responsecache.cached_response(responsecache.detail_key(drf_request, pk), lambda: _event_detail(drf_request, pk))
+
+    response = await sync_to_async(cached)()
+
+    headers = {}
+    # The viewset's 404 is raised before anything is cached or tagged.
+    if response.status_code == status.HTTP_200_OK:
+        headers['X-Cache'] = response['X-Cache']
+        if tag is not None:
+            headers['ETag'] = tag
+    return _async_json(response.data, response.status_code, headers)